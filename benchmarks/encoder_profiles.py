@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark encoder effort profiles
+
+Encodes synthetic photo and screenshot frames with every profile in
+ENCODER_PROFILES and reports encode throughput and output size.
+
+Usage:
+    python benchmarks/encoder_profiles.py [--width 1200] [--repeat 3]
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_optimizer.config import ENCODER_PROFILES, QUALITY_SETTINGS
+from image_optimizer.processor import ImageProcessor
+
+
+def make_photo(width, height):
+    """Noisy gradient standing in for a camera photo"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x * 255 / width, y * 255 / height, (x + y) * 127 / (width + height)], axis=2)
+    pixels += rng.normal(0, 8, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+
+
+def make_screenshot(width, height):
+    """Lines of text on a white background"""
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for row in range(10, height, 16):
+        draw.text((10, row), "for path in sorted(files): process(path)  # " * 4, fill=(20, 20, 20))
+    return img
+
+
+def bench(profile, img, content_type, format_name, repeat):
+    """Return (megapixels per second, bytes) for one profile and format"""
+    processor = ImageProcessor(backup=False, encoder_profile=profile)
+    quality = QUALITY_SETTINGS[content_type][format_name]
+    
+    start = time.perf_counter()
+    for _ in range(repeat):
+        buffer = io.BytesIO()
+        processor._save_image(img, buffer, format_name, quality, content_type)
+    elapsed = (time.perf_counter() - start) / repeat
+    
+    megapixels = img.width * img.height / 1e6
+    return megapixels / elapsed, buffer.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=1200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    # Keep per-file save messages out of the results table
+    logging.getLogger("image_optimizer").setLevel(logging.WARNING)
+    
+    height = args.width * 2 // 3
+    frames = {
+        "photo": make_photo(args.width, height),
+        "screenshot": make_screenshot(args.width, height)
+    }
+    
+    print(f"{'content':<12}{'format':<8}{'profile':<10}{'MP/s':>8}{'bytes':>10}")
+    for content_type, img in frames.items():
+        for format_name in ["jpeg", "webp"]:
+            for profile in ENCODER_PROFILES:
+                speed, size = bench(profile, img, content_type, format_name, args.repeat)
+                print(f"{content_type:<12}{format_name:<8}{profile:<10}{speed:>8.1f}{size:>10}")
+
+
+if __name__ == "__main__":
+    main()
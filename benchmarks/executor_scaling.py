@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch throughput for the thread and process executors
+
+Writes a folder of synthetic photos and screenshots, then runs
+BatchProcessor.process_folder with each executor at every worker count
+from 1 up to the number of cores, reporting images per second.
+
+Usage:
+    python benchmarks/executor_scaling.py [--images 24] [--width 1600] [--max-workers 8]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep progress bars out of the results table; tqdm reads this on import
+os.environ["TQDM_DISABLE"] = "1"
+
+from benchmarks.encoder_profiles import make_photo, make_screenshot
+from image_optimizer.batch import BatchProcessor
+from image_optimizer.config import EXECUTORS
+from image_optimizer.utils import clear_content_type_cache
+
+
+def make_corpus(folder, count, width):
+    """Write count images alternating between photos and screenshots"""
+    height = width * 2 // 3
+    photo = make_photo(width, height)
+    screenshot = make_screenshot(width, height)
+    for index in range(count):
+        if index % 2:
+            screenshot.save(folder / f"screenshot_{index}.png", "PNG")
+        else:
+            photo.save(folder / f"photo_{index}.jpg", "JPEG", quality=92)
+
+
+def clear_outputs(folder):
+    """Remove the <stem>_<width>px folders left by the previous run"""
+    for path in folder.iterdir():
+        if path.is_dir():
+            shutil.rmtree(path)
+
+
+def bench(folder, executor, workers, count):
+    """Return images per second for one executor and worker count"""
+    clear_outputs(folder)
+    clear_content_type_cache()
+    processor = BatchProcessor(max_workers=workers, executor=executor, backup=False)
+    
+    start = time.perf_counter()
+    processor.process_folder(folder, recursive=False, sizes=[400, 800, 1200])
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    
+    # Keep per-file messages out of the results table
+    logging.getLogger("image_optimizer").setLevel(logging.WARNING)
+    
+    folder = Path(tempfile.mkdtemp())
+    try:
+        make_corpus(folder, args.images, args.width)
+        
+        print(f"{'workers':<9}" + "".join(f"{executor + ' img/s':>16}" for executor in EXECUTORS))
+        for workers in range(1, args.max_workers + 1):
+            speeds = [bench(folder, executor, workers, args.images) for executor in EXECUTORS]
+            print(f"{workers:<9}" + "".join(f"{speed:>16.2f}" for speed in speeds))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
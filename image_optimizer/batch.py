@@ -2,30 +2,425 @@
 Batch processing functionality for multiple images
 """
 
+import asyncio
+import io
 import os
+import queue
+import threading
+import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from tqdm import tqdm
+from PIL import Image
 import logging
 
 from .processor import ImageProcessor
-from .utils import is_image_file, format_file_size, get_file_size
+from .scheduling import order_files, get_policy
+from .utils import (
+    iter_image_files,
+    is_image_file,
+    is_output_path,
+    format_file_size,
+    get_file_size,
+    estimate_decoded_bytes
+)
+from .config import (
+    EXECUTORS,
+    DEFAULT_EXECUTOR,
+    ENGINES,
+    DEFAULT_ENGINE,
+    PIPELINE_STAGE_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    ASYNC_CONCURRENCY,
+    MEMORY_BUDGET,
+    DEFAULT_SCHEDULE,
+    IGNORE_PATTERNS,
+    IN_FLIGHT_PER_WORKER
+)
 
 logger = logging.getLogger(__name__)
 
+# ImageProcessor owned by a process pool worker, built by _init_worker
+_worker_processor = None
+
+
+def _init_worker(processor_kwargs):
+    """Build the ImageProcessor for this worker process"""
+    global _worker_processor
+    _worker_processor = ImageProcessor(**processor_kwargs)
+
+
+def _run_in_worker(method_name, image_path, task_kwargs):
+    """
+    Run an ImageProcessor method in a worker process
+    
+    Returns:
+        Tuple of (method result, statistics added by this call)
+    """
+    _worker_processor.reset_stats()
+    result = getattr(_worker_processor, method_name)(image_path, **task_kwargs)
+    return result, _worker_processor.stats
+
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+def _count(image_files):
+    """Number of files for a progress bar, None for a lazy iterator"""
+    return len(image_files) if hasattr(image_files, "__len__") else None
+
+
+class MemoryBudget:
+    """
+    Admission control for decoded image memory
+    
+    Work reserves its estimated memory before it starts and releases it
+    when it finishes. A reservation fits while the total stays within the
+    limit; one larger than the whole limit only fits when nothing else is
+    reserved, so that image runs alone.
+    """
+    
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.reserved = 0
+        self.active = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+    
+    def _fits(self, amount):
+        return self.limit is None or self.active == 0 or self.reserved + amount <= self.limit
+    
+    def _reserve(self, amount):
+        self.reserved += amount
+        self.active += 1
+        self.peak = max(self.peak, self.reserved)
+    
+    def try_acquire(self, amount):
+        """Reserve amount if it fits now; returns whether it was reserved"""
+        with self._condition:
+            if not self._fits(amount):
+                return False
+            self._reserve(amount)
+            return True
+    
+    def acquire(self, amount):
+        """Block until amount fits, then reserve it"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._fits(amount))
+            self._reserve(amount)
+    
+    def release(self, amount):
+        """Return a reservation made by try_acquire or acquire"""
+        with self._condition:
+            self.reserved -= amount
+            self.active -= 1
+            self._condition.notify_all()
+
+
+class StagedPipeline:
+    """
+    Read -> decode -> resize -> encode -> write pipeline over an ImageProcessor
+    
+    Each stage has its own worker threads fed by a bounded queue, so a slow
+    stage holds back its producers instead of piling up decoded images.
+    Pillow releases the GIL while decoding, resizing and encoding, so the
+    CPU stages run in parallel. A single writer thread does every file
+    write in order, overlapping disk I/O with the CPU stages.
+    
+    Animated sources and sources large enough for shared-memory encoding
+    are encoded whole in the encode stage. With a MemoryBudget, an image is
+    only fed to the read stage once its estimated decoded size fits, and
+    its reservation is released when the writer finishes it.
+    """
+    
+    STAGES = ["read", "decode", "resize", "encode", "write"]
+    
+    def __init__(self, processor, stage_workers=None, queue_size=None, memory_budget=None):
+        self.processor = processor
+        self.memory_budget = memory_budget
+        self.workers = {**PIPELINE_STAGE_WORKERS, **(stage_workers or {}), "write": 1}
+        self.queue_size = queue_size or PIPELINE_QUEUE_SIZE
+        for stage, count in self.workers.items():
+            if stage not in self.STAGES or count < 1:
+                raise ValueError(f"Invalid worker count for stage {stage}: {count}")
+        self.stats = {}
+    
+    def run(self, image_files, on_result=None, **process_kwargs):
+        """
+        Process image files through the pipeline
+        
+        Args:
+            image_files: Paths of the images to process
+            on_result: Called from the writer thread with each result
+            **process_kwargs: Arguments accepted by process_image()
+        
+        Returns:
+            List of processing results, in completion order
+        """
+        self.process_kwargs = process_kwargs
+        self.on_result = on_result
+        self.results = []
+        self._lock = threading.Lock()
+        self.queues = {stage: queue.Queue(maxsize=self.queue_size) for stage in self.STAGES}
+        self._running = dict(self.workers)
+        self.stats = {
+            stage: {"workers": self.workers[stage], "items": 0, "busy_seconds": 0.0,
+                    "max_queue": 0, "queue_samples": 0, "queue_total": 0}
+            for stage in self.STAGES
+        }
+        
+        handlers = {
+            "read": self._read,
+            "decode": self._decode,
+            "resize": self._resize,
+            "encode": self._encode,
+            "write": self._write
+        }
+        threads = [
+            threading.Thread(target=self._stage_worker, args=(stage, handlers[stage]),
+                             name=f"pipeline-{stage}-{index}", daemon=True)
+            for stage in self.STAGES
+            for index in range(self.workers[stage])
+        ]
+        
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for image_path in image_files:
+            job = {"image_path": Path(image_path), "reserved": 0}
+            if self.memory_budget is not None:
+                job["reserved"] = estimate_decoded_bytes(image_path)
+                self.memory_budget.acquire(job["reserved"])
+            self.queues["read"].put(job)
+        for _ in range(self.workers["read"]):
+            self.queues["read"].put(_DONE)
+        for thread in threads:
+            thread.join()
+        self.wall_seconds = time.perf_counter() - start
+        
+        return self.results
+    
+    def get_stats(self):
+        """
+        Get per-stage statistics from the last run
+        
+        Utilisation is busy time over wall time times the stage's workers.
+        Queue depths are sampled each time a stage takes an item.
+        """
+        stats = {}
+        for stage, counters in self.stats.items():
+            capacity = self.wall_seconds * counters["workers"]
+            stats[stage] = {
+                "workers": counters["workers"],
+                "items": counters["items"],
+                "busy_seconds": counters["busy_seconds"],
+                "utilisation": counters["busy_seconds"] / capacity if capacity else 0.0,
+                "max_queue": counters["max_queue"],
+                "mean_queue": counters["queue_total"] / counters["queue_samples"] if counters["queue_samples"] else 0.0
+            }
+        return stats
+    
+    def _stage_worker(self, stage, handler):
+        """Take items from the stage's queue until every producer is done"""
+        inbox = self.queues[stage]
+        counters = self.stats[stage]
+        while True:
+            depth = inbox.qsize()
+            item = inbox.get()
+            if item is _DONE:
+                self._stage_finished(stage)
+                return
+            
+            start = time.perf_counter()
+            handler(item)
+            with self._lock:
+                counters["busy_seconds"] += time.perf_counter() - start
+                counters["items"] += 1
+                counters["max_queue"] = max(counters["max_queue"], depth)
+                counters["queue_samples"] += 1
+                counters["queue_total"] += depth
+    
+    def _stage_finished(self, stage):
+        """Pass the end marker on once the stage's last worker exits"""
+        with self._lock:
+            self._running[stage] -= 1
+            last = self._running[stage] == 0
+        index = self.STAGES.index(stage)
+        if last and index + 1 < len(self.STAGES):
+            next_stage = self.STAGES[index + 1]
+            for _ in range(self.workers[next_stage]):
+                self.queues[next_stage].put(_DONE)
+    
+    def _forward(self, stage, job):
+        """Hand a job to the stage after this one, or to the writer on error"""
+        if "error" in job:
+            self.queues["write"].put((job, None, ()))
+            return
+        next_stage = self.STAGES[self.STAGES.index(stage) + 1]
+        if next_stage == "write":
+            self.queues["write"].put((job, None, ()))
+        else:
+            self.queues[next_stage].put(job)
+    
+    def _defer(self, job):
+        """Build the defer callable that queues a file operation for the writer"""
+        def defer(function, *args):
+            self.queues["write"].put((job, function, args))
+        return defer
+    
+    def _run_stage(self, stage, job, work):
+        """Run one stage's work for a job, recording the first failure"""
+        try:
+            work(job)
+        except Exception as e:
+            logger.error(f"Failed to process {job['image_path']} in {stage}: {str(e)}")
+            job["error"] = str(e)
+            if job.get("source") is not None:
+                job["source"].close()
+        self._forward(stage, job)
+    
+    def _read(self, job):
+        def work(job):
+            image_path = job["image_path"]
+            kwargs = self.process_kwargs
+            job["results"] = self.processor._new_results(
+                image_path, kwargs.get("target_ssim"), kwargs.get("max_bytes")
+            )
+            job["data"] = image_path.read_bytes()
+            
+            # The writer copies the original while the CPU stages run
+            if self.processor.backup and not kwargs.get("dry_run", False):
+                self._defer(job)(self._backup, job)
+        self._run_stage("read", job, work)
+    
+    def _backup(self, job):
+        job["results"]["backup_created"] = self.processor._create_backup(job["image_path"])
+    
+    def _decode(self, job):
+        def work(job):
+            kwargs = self.process_kwargs
+            source = Image.open(io.BytesIO(job.pop("data")))
+            job["source"] = source
+            job["plan"] = self.processor._plan_image(
+                source, job["image_path"], job["results"], kwargs.get("sizes"), kwargs.get("quality"),
+                kwargs.get("generate_webp", True), kwargs.get("dry_run", False),
+                kwargs.get("target_ssim"), kwargs.get("max_bytes"), kwargs.get("output_formats")
+            )
+            if not job["plan"]["animated"]:
+                job["source"] = self.processor._to_full_colour(source)
+                job["source"].load()
+        self._run_stage("decode", job, work)
+    
+    def _resize(self, job):
+        def work(job):
+            plan = job["plan"]
+            source = job["source"]
+            if plan["animated"] or self.processor._uses_shared_memory(source, plan["dry_run"]):
+                return
+            job["frames"] = list(self.processor._resize_frames(
+                source, plan["output_sizes"], plan["dry_run"], plan["transform"]
+            ))
+            source.close()
+            job["source"] = None
+        self._run_stage("resize", job, work)
+    
+    def _encode(self, job):
+        def work(job):
+            plan = job["plan"]
+            processor = self.processor
+            if plan["animated"]:
+                job["outputs"], job["results"]["animation"] = processor._encode_animation(
+                    job["source"], job["image_path"], plan["output_sizes"], plan["formats"],
+                    plan["transform"], plan["quality"], plan["content_type"], plan["lossless"],
+                    plan["dry_run"]
+                )
+            else:
+                job["outputs"] = processor._encode_still(
+                    job["source"], job["image_path"], plan["output_sizes"], plan["formats"],
+                    plan["transform"], plan["quality"], plan["content_type"], plan["dry_run"],
+                    target_ssim=plan["target_ssim"], max_bytes=plan["max_bytes"],
+                    lossless=plan["lossless"], keep_palette=plan["keep_palette"],
+                    frames=job.get("frames"), defer=self._defer(job)
+                )
+            if job.get("source") is not None:
+                job["source"].close()
+            job.pop("frames", None)
+        self._run_stage("encode", job, work)
+    
+    def _write(self, item):
+        """Run a queued file operation, or finish a job once its writes are done"""
+        job, function, args = item
+        if function is not None:
+            if "error" in job:
+                return
+            try:
+                function(*args)
+            except Exception as e:
+                logger.error(f"Failed to write output for {job['image_path']}: {str(e)}")
+                job["error"] = str(e)
+            return
+        
+        if "error" in job:
+            result = {"original_path": str(job["image_path"]), "error": job["error"], "outputs": []}
+        else:
+            try:
+                result = self.processor._finish_image(job["results"], job["plan"], job["outputs"])
+            except Exception as e:
+                logger.error(f"Failed to finish {job['image_path']}: {str(e)}")
+                result = {"original_path": str(job["image_path"]), "error": str(e), "outputs": []}
+        
+        if self.memory_budget is not None:
+            self.memory_budget.release(job["reserved"])
+        self.results.append(result)
+        if self.on_result is not None:
+            self.on_result(result)
+
 
 class BatchProcessor:
     """Batch processing class for multiple images"""
     
-    def __init__(self, max_workers=4, **processor_kwargs):
+    def __init__(self, max_workers=4, executor=None, engine=None, stage_workers=None, memory_budget=None,
+                 schedule=None, ignore=None, **processor_kwargs):
         self.max_workers = max_workers
+        self.executor = executor or DEFAULT_EXECUTOR
+        self.engine = engine or DEFAULT_ENGINE
+        if self.executor not in EXECUTORS:
+            raise ValueError(f"Unsupported executor: {self.executor}")
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unsupported engine: {self.engine}")
+        if self.engine == "pipeline" and self.executor == "process":
+            raise ValueError("The pipeline engine runs on threads; use executor='thread'")
+        self.stage_workers = stage_workers
+        self.pipeline_stats = None
+        self.memory_budget = memory_budget if memory_budget is not None else MEMORY_BUDGET
+        if self.memory_budget is not None and self.memory_budget <= 0:
+            raise ValueError(f"Memory budget must be positive: {self.memory_budget}")
+        self.memory_peak = 0
+        self.schedule = get_policy(schedule or DEFAULT_SCHEDULE).name
+        self.ignore = list(IGNORE_PATTERNS if ignore is None else ignore)
+        self.processor_kwargs = processor_kwargs
         self.processor = ImageProcessor(**processor_kwargs)
+        
+        # Thread workers share the processor's encode, tile and shared-memory
+        # pools. Each worker process has its own, so the cores are split
+        # between them.
+        self.worker_kwargs = dict(processor_kwargs)
+        if self.executor == "process":
+            cores = max(1, (os.cpu_count() or 1) // max_workers)
+            for name in ("encode_workers", "tile_workers", "shared_workers"):
+                if not processor_kwargs.get(name):
+                    self.worker_kwargs[name] = cores
         self.results = []
     
     def process_folder(self, folder_path, recursive=True, **process_kwargs):
         """
         Process all images in a folder
         
+        Files are started in the order of the batch's schedule (see
+        scheduling.py). With the default path schedule they are streamed
+        from the folder walk, so processing starts with the first file found.
+        
         Args:
             folder_path: Path to the folder containing images
             recursive: Whether to process subfolders
@@ -38,34 +433,233 @@ class BatchProcessor:
         if not folder_path.exists():
             raise FileNotFoundError(f"Folder not found: {folder_path}")
         
-        # Find all image files
-        image_files = self._find_image_files(folder_path, recursive)
+        image_files = self._discover(folder_path, recursive, process_kwargs.get("sizes"))
+        self.results = self._process_files(image_files, process_kwargs)
         
-        if not image_files:
+        if not self.results:
             logger.warning(f"No image files found in {folder_path}")
-            return []
+        return self.results
+    
+    def process_paths(self, paths, **process_kwargs):
+        """
+        Process an explicit list of image files
         
-        logger.info(f"Found {len(image_files)} image files to process")
+        For callers that already know which files changed, so no folder is
+        walked. paths may be a lazy iterable (e.g. read from a pipe); files
+        are started as they arrive unless the schedule needs to probe them
+        all first. Unsupported extensions, files inside the backup folder,
+        and outputs the optimizer wrote (<stem>_<width>px/<stem>.<ext>) are
+        skipped. Missing files produce error results.
         
-        # Process images in parallel
+        Args:
+            paths: Iterable of image file paths
+            **process_kwargs: Arguments to pass to process_image()
+        
+        Returns:
+            List of processing results
+        """
+        image_files = self._filter_paths(paths)
+        if get_policy(self.schedule).probe:
+            image_files = order_files(list(image_files), self.schedule, process_kwargs.get("sizes"))
+        self.results = self._process_files(image_files, process_kwargs)
+        
+        if not self.results:
+            logger.warning("No image files given")
+        return self.results
+    
+    def _filter_paths(self, paths):
+        """Yield the given paths that are source images"""
+        backup_location = Path(os.path.abspath(self.processor.backup_folder))
+        for path in paths:
+            path = Path(path)
+            if not is_image_file(path) or is_output_path(path):
+                logger.debug(f"Skipping {path}: not a source image")
+                continue
+            if backup_location in Path(os.path.abspath(path)).parents:
+                logger.debug(f"Skipping {path}: inside the backup folder")
+                continue
+            yield path
+    
+    def _process_files(self, image_files, process_kwargs):
+        """Run process_image over image files on the configured engine"""
+        if self.engine == "pipeline":
+            return self._run_pipeline(image_files, process_kwargs)
+        return self._run("process_image", image_files, "Processing images", process_kwargs)
+    
+    async def process_folder_async(self, folder_path, recursive=True, concurrency=None, executor=None,
+                                   **process_kwargs):
+        """
+        Process all images in a folder, yielding each result as it finishes
+        
+        At most concurrency images are in flight; the rest are not started
+        until a slot frees up. Leaving the loop early or cancelling the
+        consumer cancels the images still in flight.
+        
+        Args:
+            folder_path: Path to the folder containing images
+            recursive: Whether to process subfolders
+            concurrency: Images processed at once (default ASYNC_CONCURRENCY)
+            executor: concurrent.futures executor for the work (the loop's
+                default thread pool if None)
+            **process_kwargs: Arguments to pass to process_image()
+        
+        Yields:
+            Processing results, in completion order
+        """
+        folder_path = Path(folder_path)
+        if not folder_path.exists():
+            raise FileNotFoundError(f"Folder not found: {folder_path}")
+        
+        loop = asyncio.get_running_loop()
+        image_files = await loop.run_in_executor(executor, self._find_image_files, folder_path, recursive)
+        if not image_files:
+            logger.warning(f"No image files found in {folder_path}")
+            return
+        image_files = await loop.run_in_executor(
+            executor, order_files, image_files, self.schedule, process_kwargs.get("sizes")
+        )
+        
+        limit = concurrency or ASYNC_CONCURRENCY
+        remaining = iter(image_files)
+        pending = set()
         self.results = []
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all tasks
-            future_to_file = {
-                executor.submit(
-                    self.processor.process_image, 
-                    img_path, 
-                    **process_kwargs
-                ): img_path for img_path in image_files
+        try:
+            while True:
+                for img_path in remaining:
+                    pending.add(asyncio.ensure_future(
+                        self._process_image_async(img_path, executor, process_kwargs)
+                    ))
+                    if len(pending) >= limit:
+                        break
+                if not pending:
+                    return
+                
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    self.results.append(result)
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def _process_image_async(self, img_path, executor, process_kwargs):
+        """Process one image, turning failures into error results"""
+        try:
+            return await self.processor.process_image_async(img_path, executor=executor, **process_kwargs)
+        except Exception as e:
+            logger.error(f"Failed to process {img_path}: {str(e)}")
+            return {
+                "original_path": str(img_path),
+                "error": str(e),
+                "outputs": []
             }
+    
+    def _run_pipeline(self, image_files, process_kwargs):
+        """Run process_image's stages through a StagedPipeline"""
+        budget = MemoryBudget(self.memory_budget) if self.memory_budget is not None else None
+        pipeline = StagedPipeline(self.processor, self.stage_workers, memory_budget=budget)
+        with tqdm(total=_count(image_files), desc="Processing images") as pbar:
+            def on_result(result):
+                pbar.set_postfix({"file": Path(result["original_path"]).name[:20]})
+                pbar.update(1)
             
-            # Process with progress bar
-            with tqdm(total=len(image_files), desc="Processing images") as pbar:
-                for future in as_completed(future_to_file):
-                    img_path = future_to_file[future]
+            results = pipeline.run(image_files, on_result=on_result, **process_kwargs)
+        
+        self.pipeline_stats = pipeline.get_stats()
+        if budget is not None:
+            self.memory_peak = budget.peak
+        return results
+    
+    def recompress_folder(self, folder_path, recursive=True, dry_run=False):
+        """
+        Losslessly recompress all originals in a folder in place
+        
+        Args:
+            folder_path: Path to the folder containing images
+            recursive: Whether to process subfolders
+            dry_run: If True, only report what would be saved
+        
+        Returns:
+            List of recompression results
+        """
+        folder_path = Path(folder_path)
+        if not folder_path.exists():
+            raise FileNotFoundError(f"Folder not found: {folder_path}")
+        
+        image_files = self._discover(folder_path, recursive)
+        self.results = self._run(
+            "recompress_image", image_files, "Recompressing images", {"dry_run": dry_run}
+        )
+        
+        if not self.results:
+            logger.warning(f"No image files found in {folder_path}")
+        return self.results
+    
+    def _run(self, method_name, image_files, description, task_kwargs):
+        """
+        Run an ImageProcessor method on every file in parallel, collecting
+        results and errors
+        
+        Process pool workers each build their own ImageProcessor; the stats
+        they add are merged into self.processor as results arrive.
+        
+        image_files may be a lazy iterator. Files are taken from it in
+        order, at most IN_FLIGHT_PER_WORKER per worker at a time. With a
+        memory budget, at most max_workers are in flight, and only while
+        their estimated decoded sizes fit the budget.
+        """
+        if self.executor == "process":
+            pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.worker_kwargs,)
+            )
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        
+        budget = MemoryBudget(self.memory_budget)
+        estimates = {}
+        in_flight_limit = self.max_workers * IN_FLIGHT_PER_WORKER
+        if self.memory_budget is not None:
+            in_flight_limit = self.max_workers
+        
+        def estimate(img_path):
+            if self.memory_budget is None:
+                return 0
+            if img_path not in estimates:
+                estimates[img_path] = estimate_decoded_bytes(img_path)
+            return estimates[img_path]
+        
+        results = []
+        remaining = iter(image_files)
+        next_file = next(remaining, None)
+        future_to_file = {}
+        with pool as executor, tqdm(total=_count(image_files), desc=description) as pbar:
+            def submit(img_path):
+                if self.executor == "process":
+                    return executor.submit(_run_in_worker, method_name, img_path, task_kwargs)
+                return executor.submit(getattr(self.processor, method_name), img_path, **task_kwargs)
+            
+            while next_file is not None or future_to_file:
+                # Start files while workers are free and their memory fits
+                while (next_file is not None and len(future_to_file) < in_flight_limit
+                       and budget.try_acquire(estimate(next_file))):
+                    future_to_file[submit(next_file)] = next_file
+                    next_file = next(remaining, None)
+                
+                done, _ = wait(future_to_file, return_when=FIRST_COMPLETED)
+                for future in done:
+                    img_path = future_to_file.pop(future)
+                    budget.release(estimate(img_path))
                     try:
                         result = future.result()
-                        self.results.append(result)
+                        if self.executor == "process":
+                            result, stats = result
+                            self.processor.merge_stats(stats)
+                        results.append(result)
                         pbar.set_postfix({
                             "file": img_path.name[:20],
                             "size": format_file_size(get_file_size(img_path))
@@ -73,7 +667,7 @@ class BatchProcessor:
                     except Exception as e:
                         logger.error(f"Failed to process {img_path}: {str(e)}")
                         # Add error result
-                        self.results.append({
+                        results.append({
                             "original_path": str(img_path),
                             "error": str(e),
                             "outputs": []
@@ -81,22 +675,29 @@ class BatchProcessor:
                     finally:
                         pbar.update(1)
         
-        return self.results
+        self.memory_peak = budget.peak if self.memory_budget is not None else 0
+        return results
     
     def _find_image_files(self, folder_path, recursive):
         """Find all image files in folder"""
-        image_files = []
-        
-        if recursive:
-            pattern = "**/*"
-        else:
-            pattern = "*"
-        
-        for file_path in folder_path.glob(pattern):
-            if file_path.is_file() and is_image_file(file_path):
-                image_files.append(file_path)
+        return sorted(self._iter_image_files(folder_path, recursive))
+    
+    def _iter_image_files(self, folder_path, recursive):
+        """Walk a folder for source images, skipping outputs, backups and ignored paths"""
+        return iter_image_files(
+            folder_path, recursive, ignore=self.ignore, backup_folder=self.processor.backup_folder
+        )
+    
+    def _discover(self, folder_path, recursive, sizes=None):
+        """
+        Get a run's files in schedule order
         
-        return sorted(image_files)
+        Schedules that need no header probe are streamed straight from the
+        folder walk; the others walk the whole folder first to order it.
+        """
+        if not get_policy(self.schedule).probe:
+            return self._iter_image_files(folder_path, recursive)
+        return order_files(self._find_image_files(folder_path, recursive), self.schedule, sizes)
     
     def analyze_folder(self, folder_path, recursive=True):
         """
@@ -210,4 +811,19 @@ class BatchProcessor:
             print(f"Original total size: {stats['original_size_formatted']}")
             print(f"Optimized total size: {stats['optimized_size_formatted']}")
             print(f"Size reduction: {stats['size_reduction_percent']:.1f}%")
-            print(f"Files created: {stats['files_created']}")
\ No newline at end of file
+            print(f"Files created: {stats['files_created']}")
+            
+            pruned = sum(len(r.get("pruned", [])) for r in self.results)
+            if pruned:
+                print(f"Outputs pruned: {pruned}")
+        
+        if self.memory_budget is not None:
+            print(f"Memory budget: {format_file_size(self.memory_budget)} "
+                  f"(peak estimate in flight: {format_file_size(self.memory_peak)})")
+        
+        if self.pipeline_stats:
+            print(f"\n--- Pipeline Stages ---")
+            print(f"{'stage':<8}{'workers':>8}{'items':>8}{'busy':>8}{'queue max/mean':>16}")
+            for stage, info in self.pipeline_stats.items():
+                print(f"{stage:<8}{info['workers']:>8}{info['items']:>8}{info['utilisation']:>8.0%}"
+                      f"{info['max_queue']:>10}/{info['mean_queue']:<5.1f}")
\ No newline at end of file
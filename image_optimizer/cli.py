@@ -8,7 +8,101 @@ from pathlib import Path
 
 from .processor import ImageProcessor
 from .batch import BatchProcessor
-from .utils import format_file_size
+from .utils import format_file_size, iter_path_list
+from .codecs import get_codec
+from .scheduling import SCHEDULING_POLICIES
+from .config import (
+    RESIZE_MODES,
+    DEFAULT_RESIZE_MODE,
+    RESAMPLING_PRESETS,
+    DEFAULT_RESAMPLING,
+    DRAFT_DECODE,
+    ENCODER_PROFILES,
+    DEFAULT_ENCODER_PROFILE,
+    PRUNE_OUTPUTS,
+    PRUNE_RATIO,
+    OUTPUT_LAYOUTS,
+    DEFAULT_OUTPUT_LAYOUT,
+    EXECUTORS,
+    DEFAULT_EXECUTOR,
+    ENGINES,
+    DEFAULT_ENGINE,
+    DEFAULT_SCHEDULE
+)
+
+
+def parse_max_bytes(value):
+    """Parse --max-bytes into an int, a dict of width to bytes, or None"""
+    if not value:
+        return None
+    if ":" not in value:
+        return int(value)
+    
+    budgets = {}
+    for pair in value.split(","):
+        width, limit = pair.split(":")
+        budgets[int(width.strip())] = int(limit.strip())
+    return budgets
+
+
+# Suffixes accepted by --memory-budget
+_BYTE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_memory_budget(value):
+    """Parse --memory-budget (a byte count, or with a K/M/G/T suffix) into bytes, or None"""
+    if not value:
+        return None
+    
+    value = value.strip().upper()
+    if value.endswith("B"):
+        value = value[:-1]
+    multiplier = 1
+    if value and value[-1] in _BYTE_UNITS:
+        multiplier = _BYTE_UNITS[value[-1]]
+        value = value[:-1]
+    budget = int(float(value) * multiplier)
+    if budget <= 0:
+        raise ValueError(f"Memory budget must be positive: {value}")
+    return budget
+
+
+def parse_stage_workers(value):
+    """Parse --stage-workers (decode=2,encode=4) into a dict, or None"""
+    if not value:
+        return None
+    
+    workers = {}
+    for pair in value.split(","):
+        stage, count = pair.split("=")
+        workers[stage.strip()] = int(count.strip())
+    return workers
+
+
+def parse_formats(value):
+    """
+    Parse --formats into a list of codec names
+    
+    Codecs this Pillow build cannot encode are skipped with a warning.
+    Returns None when no formats were given.
+    
+    Raises:
+        ValueError: For unknown formats, or if no requested format is available
+    """
+    if not value:
+        return None
+    
+    formats = []
+    for name in value.split(","):
+        codec = get_codec(name.strip())
+        if not codec.available:
+            click.echo(f"Warning: skipping {codec.name}, not supported by this Pillow build", err=True)
+            continue
+        formats.append(codec.name)
+    
+    if not formats:
+        raise ValueError(f"None of the requested formats are available: {value}")
+    return formats
 
 
 @click.group()
@@ -31,8 +125,32 @@ def main():
 @click.option("--backup/--no-backup", default=True, help="Backup original files")
 @click.option("--backup-folder", default=".image_optimizer_backup", 
               help="Backup folder name")
+@click.option("--resize-mode", type=click.Choice(RESIZE_MODES), default=DEFAULT_RESIZE_MODE,
+              help="Resize every size from the source (direct) or from the next larger size (cascade)")
+@click.option("--draft/--no-draft", default=DRAFT_DECODE,
+              help="Decode large JPEGs at a reduced scale when all outputs are much smaller")
+@click.option("--resampling", type=click.Choice(list(RESAMPLING_PRESETS)), default=DEFAULT_RESAMPLING,
+              help="Resampling preset: box pre-reduce before LANCZOS (fast, balanced, sharp) or exact LANCZOS")
+@click.option("--profile", "encoder_profile", type=click.Choice(list(ENCODER_PROFILES)),
+              default=DEFAULT_ENCODER_PROFILE,
+              help="Encoder effort: fast for previews, balanced, or max for publishing")
+@click.option("--formats", "-f",
+              help="Comma-separated output formats to allow, e.g. jpeg,webp,avif (default: from config)")
+@click.option("--target-ssim", type=float,
+              help="Pick the lowest quality whose SSIM is at least this value (e.g. 0.95)")
+@click.option("--max-bytes",
+              help="Pick the highest quality that fits: a byte count, or width:bytes pairs (400:30000,800:80000)")
+@click.option("--prune/--no-prune", default=PRUNE_OUTPUTS,
+              help="Delete outputs that are not smaller than a more compatible alternative")
+@click.option("--prune-ratio", type=float, default=PRUNE_RATIO,
+              help=f"Keep an output only below this fraction of the alternative's size (default: {PRUNE_RATIO})")
+@click.option("--layout", type=click.Choice(OUTPUT_LAYOUTS), default=DEFAULT_OUTPUT_LAYOUT,
+              help="How widths larger than the source reuse the encoded file: hardlink, symlink or manifest")
+@click.option("--encode-workers", type=int,
+              help="Threads encoding one image's outputs at once (default: one per core)")
 @click.option("--dry-run", is_flag=True, help="Show what would be done without making changes")
-def optimize(image_path, sizes, quality, webp, backup, backup_folder, dry_run):
+def optimize(image_path, sizes, quality, webp, backup, backup_folder, resize_mode, draft, resampling, encoder_profile,
+             formats, target_ssim, max_bytes, prune, prune_ratio, layout, encode_workers, dry_run):
     """Optimize a single image file"""
     
     # Parse sizes
@@ -42,8 +160,33 @@ def optimize(image_path, sizes, quality, webp, backup, backup_folder, dry_run):
         click.echo("Error: Sizes must be comma-separated integers", err=True)
         sys.exit(1)
     
+    # Parse byte budget
     try:
-        processor = ImageProcessor(backup=backup, backup_folder=backup_folder)
+        byte_budget = parse_max_bytes(max_bytes)
+    except ValueError:
+        click.echo("Error: Max bytes must be an integer or comma-separated width:bytes pairs", err=True)
+        sys.exit(1)
+    
+    # Parse output formats
+    try:
+        format_list = parse_formats(formats)
+    except ValueError as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+    
+    try:
+        processor = ImageProcessor(
+            backup=backup, 
+            backup_folder=backup_folder, 
+            resize_mode=resize_mode,
+            draft=draft,
+            resampling=resampling,
+            encoder_profile=encoder_profile,
+            prune=prune,
+            prune_ratio=prune_ratio,
+            layout=layout,
+            encode_workers=encode_workers
+        )
         
         if dry_run:
             click.echo("DRY RUN MODE - No files will be modified\n")
@@ -53,7 +196,10 @@ def optimize(image_path, sizes, quality, webp, backup, backup_folder, dry_run):
             sizes=size_list,
             quality=quality,
             generate_webp=webp,
-            dry_run=dry_run
+            dry_run=dry_run,
+            target_ssim=target_ssim,
+            max_bytes=byte_budget,
+            output_formats=format_list
         )
         
         # Display results
@@ -63,11 +209,31 @@ def optimize(image_path, sizes, quality, webp, backup, backup_folder, dry_run):
         if result["backup_created"]:
             click.echo(f"Backup created: {backup_folder}")
         
+        if "animation" in result:
+            animation = result["animation"]
+            click.echo(f"Animation: {animation['source_frames']} frames, "
+                       f"{animation['merged_frames']} merged as duplicates")
+        
         if result["outputs"]:
             click.echo(f"\nGenerated {len(result['outputs'])} output files:")
             for output in result["outputs"]:
                 size_str = f"{output['size'][0]}x{output['size'][1]}"
-                click.echo(f"  {output['path']} ({size_str}, {output['format'].upper()}, {format_file_size(output['file_size'])})")
+                details = f"{size_str}, {output['format'].upper()}, {format_file_size(output['file_size'])}"
+                if "frames" in output:
+                    details += f", {output['frames']} frames"
+                if "alias_of" in output:
+                    details += f", same as {output['alias_of']}"
+                if output.get("resampling"):
+                    details += f", {output['resampling']}"
+                if "search_trials" in output:
+                    details += f", q{output['quality']} after {output['search_trials']} trials"
+                click.echo(f"  {output['path']} ({details})")
+        
+        if result.get("pruned"):
+            click.echo(f"\nPruned {len(result['pruned'])} outputs that did not beat an alternative:")
+            for output in result["pruned"]:
+                click.echo(f"  {output['path']} ({format_file_size(output['file_size'])}), "
+                           f"serving {output['fallback']}")
         
         if not dry_run:
             stats = processor.get_stats()
@@ -81,7 +247,11 @@ def optimize(image_path, sizes, quality, webp, backup, backup_folder, dry_run):
 
 
 @main.command()
-@click.argument("folder_path", type=click.Path(exists=True))
+@click.argument("folder_path", type=click.Path(exists=True), required=False)
+@click.option("--from-file", type=click.File("rb"),
+              help="Process the image paths listed in this file, one per line ('-' reads stdin)")
+@click.option("--null", "-0", "null_separated", is_flag=True,
+              help="Paths in --from-file are separated by NUL bytes (find -print0)")
 @click.option("--sizes", "-s", default="400,800,1200", 
               help="Comma-separated list of widths to generate (default: 400,800,1200)")
 @click.option("--quality", "-q", type=int, help="Override quality (0-100)")
@@ -90,10 +260,54 @@ def optimize(image_path, sizes, quality, webp, backup, backup_folder, dry_run):
 @click.option("--backup-folder", default=".image_optimizer_backup", 
               help="Backup folder name")
 @click.option("--recursive/--no-recursive", default=True, help="Process subfolders")
+@click.option("--ignore", multiple=True,
+              help="Skip files and folders matching this glob, by name or relative path (repeatable)")
 @click.option("--workers", "-w", default=4, help="Number of parallel workers")
+@click.option("--executor", type=click.Choice(EXECUTORS), default=DEFAULT_EXECUTOR,
+              help="Run workers as threads sharing one processor, or as separate processes")
+@click.option("--engine", type=click.Choice(ENGINES), default=DEFAULT_ENGINE,
+              help="One task per image (pool), or staged read/decode/resize/encode/write threads (pipeline)")
+@click.option("--stage-workers",
+              help="Pipeline threads per stage, e.g. decode=2,encode=4")
+@click.option("--schedule", type=click.Choice(list(SCHEDULING_POLICIES)), default=DEFAULT_SCHEDULE,
+              help="File order: path, largest (pixels) first, largest expected savings first, or newest first")
+@click.option("--memory-budget",
+              help="Only start images while their estimated decoded size fits, e.g. 2G (default: no limit)")
+@click.option("--resize-mode", type=click.Choice(RESIZE_MODES), default=DEFAULT_RESIZE_MODE,
+              help="Resize every size from the source (direct) or from the next larger size (cascade)")
+@click.option("--draft/--no-draft", default=DRAFT_DECODE,
+              help="Decode large JPEGs at a reduced scale when all outputs are much smaller")
+@click.option("--resampling", type=click.Choice(list(RESAMPLING_PRESETS)), default=DEFAULT_RESAMPLING,
+              help="Resampling preset: box pre-reduce before LANCZOS (fast, balanced, sharp) or exact LANCZOS")
+@click.option("--profile", "encoder_profile", type=click.Choice(list(ENCODER_PROFILES)),
+              default=DEFAULT_ENCODER_PROFILE,
+              help="Encoder effort: fast for previews, balanced, or max for publishing")
+@click.option("--formats", "-f",
+              help="Comma-separated output formats to allow, e.g. jpeg,webp,avif (default: from config)")
+@click.option("--target-ssim", type=float,
+              help="Pick the lowest quality whose SSIM is at least this value (e.g. 0.95)")
+@click.option("--max-bytes",
+              help="Pick the highest quality that fits: a byte count, or width:bytes pairs (400:30000,800:80000)")
+@click.option("--prune/--no-prune", default=PRUNE_OUTPUTS,
+              help="Delete outputs that are not smaller than a more compatible alternative")
+@click.option("--prune-ratio", type=float, default=PRUNE_RATIO,
+              help=f"Keep an output only below this fraction of the alternative's size (default: {PRUNE_RATIO})")
+@click.option("--layout", type=click.Choice(OUTPUT_LAYOUTS), default=DEFAULT_OUTPUT_LAYOUT,
+              help="How widths larger than the source reuse the encoded file: hardlink, symlink or manifest")
+@click.option("--encode-workers", type=int,
+              help="Threads encoding one image's outputs at once (default: one per core)")
 @click.option("--dry-run", is_flag=True, help="Show what would be done without making changes")
-def batch(folder_path, sizes, quality, webp, backup, backup_folder, recursive, workers, dry_run):
-    """Process all images in a folder"""
+def batch(folder_path, from_file, null_separated, sizes, quality, webp, backup, backup_folder, recursive, ignore, workers, executor, engine, stage_workers,
+          schedule, memory_budget, resize_mode, draft, resampling, encoder_profile, formats, target_ssim, max_bytes, prune, prune_ratio, layout,
+          encode_workers, dry_run):
+    """Process all images in a folder, or the images listed with --from-file"""
+    
+    if (folder_path is None) == (from_file is None):
+        click.echo("Error: Give either a folder or --from-file", err=True)
+        sys.exit(1)
+    if null_separated and from_file is None:
+        click.echo("Error: -0 only applies to --from-file", err=True)
+        sys.exit(1)
     
     # Parse sizes
     try:
@@ -102,20 +316,71 @@ def batch(folder_path, sizes, quality, webp, backup, backup_folder, recursive, w
         click.echo("Error: Sizes must be comma-separated integers", err=True)
         sys.exit(1)
     
+    # Parse byte budget
+    try:
+        byte_budget = parse_max_bytes(max_bytes)
+    except ValueError:
+        click.echo("Error: Max bytes must be an integer or comma-separated width:bytes pairs", err=True)
+        sys.exit(1)
+    
+    # Parse output formats
     try:
-        batch_processor = BatchProcessor(max_workers=workers, backup=backup, backup_folder=backup_folder)
+        format_list = parse_formats(formats)
+    except ValueError as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+    
+    # Parse pipeline stage workers
+    try:
+        stage_counts = parse_stage_workers(stage_workers)
+    except ValueError:
+        click.echo("Error: Stage workers must be comma-separated stage=count pairs", err=True)
+        sys.exit(1)
+    
+    # Parse memory budget
+    try:
+        budget_bytes = parse_memory_budget(memory_budget)
+    except ValueError:
+        click.echo("Error: Memory budget must be a positive size such as 512M or 2G", err=True)
+        sys.exit(1)
+    
+    try:
+        batch_processor = BatchProcessor(
+            max_workers=workers, 
+            executor=executor,
+            engine=engine,
+            stage_workers=stage_counts,
+            memory_budget=budget_bytes,
+            schedule=schedule,
+            ignore=ignore,
+            backup=backup, 
+            backup_folder=backup_folder,
+            resize_mode=resize_mode,
+            draft=draft,
+            resampling=resampling,
+            encoder_profile=encoder_profile,
+            prune=prune,
+            prune_ratio=prune_ratio,
+            layout=layout,
+            encode_workers=encode_workers
+        )
         
         if dry_run:
             click.echo("DRY RUN MODE - No files will be modified\n")
         
-        results = batch_processor.process_folder(
-            folder_path,
-            recursive=recursive,
+        process_kwargs = dict(
             sizes=size_list,
             quality=quality,
             generate_webp=webp,
-            dry_run=dry_run
+            dry_run=dry_run,
+            target_ssim=target_ssim,
+            max_bytes=byte_budget,
+            output_formats=format_list
         )
+        if from_file is not None:
+            batch_processor.process_paths(iter_path_list(from_file, null_separated), **process_kwargs)
+        else:
+            batch_processor.process_folder(folder_path, recursive=recursive, **process_kwargs)
         
         # Print summary
         batch_processor.print_summary()
@@ -128,6 +393,61 @@ def batch(folder_path, sizes, quality, webp, backup, backup_folder, recursive, w
         sys.exit(1)
 
 
+@main.command()
+@click.argument("path", type=click.Path(exists=True))
+@click.option("--backup/--no-backup", default=True, help="Backup original files")
+@click.option("--backup-folder", default=".image_optimizer_backup", 
+              help="Backup folder name")
+@click.option("--recursive/--no-recursive", default=True, help="Process subfolders")
+@click.option("--ignore", multiple=True,
+              help="Skip files and folders matching this glob, by name or relative path (repeatable)")
+@click.option("--workers", "-w", default=4, help="Number of parallel workers")
+@click.option("--executor", type=click.Choice(EXECUTORS), default=DEFAULT_EXECUTOR,
+              help="Run workers as threads sharing one processor, or as separate processes")
+@click.option("--dry-run", is_flag=True, help="Show what would be saved without making changes")
+def recompress(path, backup, backup_folder, recursive, ignore, workers, executor, dry_run):
+    """Losslessly recompress originals in place (a file or a folder)"""
+    
+    try:
+        batch_processor = BatchProcessor(
+            max_workers=workers,
+            executor=executor,
+            ignore=ignore,
+            backup=backup,
+            backup_folder=backup_folder
+        )
+        
+        if dry_run:
+            click.echo("DRY RUN MODE - No files will be modified\n")
+        
+        if Path(path).is_dir():
+            results = batch_processor.recompress_folder(path, recursive=recursive, dry_run=dry_run)
+        else:
+            results = [batch_processor.processor.recompress_image(path, dry_run=dry_run)]
+        
+        total_saved = 0
+        for result in sorted(results, key=lambda r: r["original_path"]):
+            if "error" in result:
+                click.echo(f"  {result['original_path']}: error: {result['error']}")
+            elif "skipped" in result:
+                click.echo(f"  {result['original_path']}: skipped ({result['skipped']})")
+            else:
+                total_saved += result["bytes_saved"]
+                click.echo(f"  {result['original_path']}: "
+                           f"{format_file_size(result['original_size'])} -> "
+                           f"{format_file_size(result['recompressed_size'])}, "
+                           f"saved {format_file_size(result['bytes_saved'])}")
+        
+        click.echo(f"\nTotal saved: {format_file_size(total_saved)}")
+        
+        if dry_run:
+            click.echo("\nDRY RUN COMPLETED - No files were modified")
+    
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+
+
 @main.command()
 @click.argument("folder_path", type=click.Path(exists=True))
 @click.option("--recursive/--no-recursive", default=True, help="Analyze subfolders")
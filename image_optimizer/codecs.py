@@ -0,0 +1,121 @@
+"""
+Registry of output encoders
+
+Each codec declares its Pillow format, file extension, default save
+options and what it can store. AVIF and JPEG XL support depends on how
+Pillow was built (or on the optional pillow-jxl-plugin package) and is
+detected at import; unavailable codecs stay registered but are skipped.
+"""
+
+import logging
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+
+class Codec:
+    """Description of an output encoder"""
+    
+    def __init__(self, name, pil_format, extension, save_kwargs=None, lossy=True,
+                 lossless_kwargs=None, alpha_kwargs=None, subsampling=None,
+                 supports_alpha=False, supports_palette=False, supports_animation=False,
+                 available=True, aliases=()):
+        self.name = name
+        self.pil_format = pil_format
+        self.extension = extension
+        self.save_kwargs = save_kwargs or {}
+        # Whether the codec takes a quality setting
+        self.lossy = lossy
+        # Extra save options for lossless encoding, None if unsupported
+        self.lossless_kwargs = lossless_kwargs
+        # Extra save options for images with an alpha channel
+        self.alpha_kwargs = alpha_kwargs or {}
+        # Maps profile subsampling codes (0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0)
+        # to the codec's save option value, None if not configurable
+        self.subsampling = subsampling
+        self.supports_alpha = supports_alpha
+        self.supports_palette = supports_palette
+        self.supports_animation = supports_animation
+        self.available = available
+        self.aliases = tuple(aliases)
+    
+    def __repr__(self):
+        return f"Codec({self.name!r}, available={self.available})"
+
+
+# Registered codecs by name
+CODECS = {}
+
+
+def register_codec(codec):
+    """Add a codec to the registry, replacing any codec of the same name"""
+    CODECS[codec.name] = codec
+    return codec
+
+
+def get_codec(name):
+    """
+    Look up a codec by name, alias or file extension
+    
+    Raises:
+        ValueError: If no codec matches
+    """
+    key = name.lower().lstrip(".")
+    if key in CODECS:
+        return CODECS[key]
+    for codec in CODECS.values():
+        if key == codec.extension or key in codec.aliases:
+            return codec
+    raise ValueError(f"Unknown output format: {name}")
+
+
+def available_codecs():
+    """Get the names of all codecs that can encode in this environment"""
+    return [name for name, codec in CODECS.items() if codec.available]
+
+
+def _jpeg_xl_available():
+    """Check for a JPEG XL encoder, loading the optional plugin if installed"""
+    try:
+        import pillow_jxl  # noqa: F401 registers the JXL format with Pillow
+    except ImportError:
+        pass
+    Image.init()
+    return "JXL" in Image.SAVE
+
+
+register_codec(Codec(
+    "jpeg", "JPEG", "jpg",
+    # Orientation is applied to the pixels, so EXIF is stripped
+    save_kwargs={"exif": b""},
+    subsampling={0: 0, 1: 1, 2: 2},
+    aliases=["jpe"]
+))
+register_codec(Codec(
+    "png", "PNG", "png",
+    lossy=False,
+    supports_alpha=True,
+    supports_palette=True
+))
+register_codec(Codec(
+    "webp", "WEBP", "webp",
+    lossless_kwargs={"lossless": True},
+    alpha_kwargs={"alpha_quality": 100},
+    supports_alpha=True,
+    supports_animation=True,
+    available=features.check("webp")
+))
+register_codec(Codec(
+    "avif", "AVIF", "avif",
+    supports_alpha=True,
+    supports_animation=True,
+    available=features.check("avif")
+))
+register_codec(Codec(
+    "jxl", "JXL", "jxl",
+    lossless_kwargs={"lossless": True},
+    supports_alpha=True,
+    supports_animation=True,
+    available=_jpeg_xl_available(),
+    aliases=["jpegxl", "jpeg-xl"]
+))
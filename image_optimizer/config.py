@@ -5,21 +5,118 @@ Configuration settings for image optimization
 # Default responsive image sizes (width in pixels)
 DEFAULT_SIZES = [400, 800, 1200]
 
+# Resize strategies:
+# - "direct" resizes every output from the full-resolution source
+# - "cascade" resizes the largest output from the source and each smaller
+#   output from the previous one, releasing the source as early as possible
+RESIZE_MODES = ["direct", "cascade"]
+DEFAULT_RESIZE_MODE = "direct"
+
+# Resampling presets map to a Pillow reducing_gap. With a gap, the frame is
+# first shrunk by an integer box reduction (Image.reduce) to within gap
+# times the target size, then finished with a LANCZOS pass. Smaller gaps
+# are faster but softer; None always resamples the whole way with LANCZOS.
+RESAMPLING_PRESETS = {
+    "fast": 1.5,
+    "balanced": 2.0,
+    "sharp": 3.0,
+    "exact": None
+}
+DEFAULT_RESAMPLING = "exact"
+
+# Decode JPEGs at a reduced scale (1/2, 1/4 or 1/8) when every output is
+# much smaller than the source. The decoded image is kept at least
+# DRAFT_REDUCING_GAP times larger than the largest output so the final
+# LANCZOS pass still has enough resolution to work with.
+DRAFT_DECODE = True
+DRAFT_REDUCING_GAP = 2.0
+
 # Quality settings for different image types
 QUALITY_SETTINGS = {
     "photo": {
         "jpeg": 85,
-        "webp": 85
+        "webp": 85,
+        "avif": 65,
+        "jxl": 85
     },
     "screenshot": {
+        "jpeg": 90,
         "png": 90,
-        "webp": 90
+        "webp": 90,
+        "avif": 75,
+        "jxl": 90
     },
     "graphic": {
+        "jpeg": 95,
         "png": 95,
-        "webp": 95
+        "webp": 95,
+        "avif": 85,
+        "jxl": 95
+    }
+}
+
+# Target-driven encoding searches quality within this range, using at most
+# QUALITY_SEARCH_MAX_TRIALS trial encodes per output
+QUALITY_SEARCH_RANGE = (30, 95)
+QUALITY_SEARCH_MAX_TRIALS = 7
+
+# Consecutive animation frames are merged into one longer frame only when no
+# channel of any pixel differs by more than this value (0-255), so that small
+# moving regions such as sprites, cursors and spinners are kept
+ANIMATION_DEDUPE_TOLERANCE = 2
+
+# Frame duration (in milliseconds) for animation frames that lack one
+DEFAULT_FRAME_DURATION = 100
+
+# Side (in pixels) of the square sample used for content type detection
+DETECTION_SAMPLE_SIZE = 256
+
+# Detected content types are cached for at most this many files, dropping
+# the least recently used first
+CONTENT_TYPE_CACHE_SIZE = 4096
+
+# Content classifier thresholds (see classifier.py)
+CLASSIFIER_THRESHOLDS = {
+    "flat_ratio": 0.5,       # Below this the image is a continuous-tone photo
+    "unique_colors": 0.25,   # Above this the image is a continuous-tone photo
+    "edge_density": 0.05,    # Above this a flat image is a text-heavy screenshot
+    "alpha_ratio": 0.0       # Above this the image is a graphic with transparency
+}
+
+# Encoder effort profiles. Each profile sets the save options per output
+# codec (see codecs.py) and the JPEG chroma subsampling per content type
+# (0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0). Measured trade-offs are listed in
+# README_IMAGE_OPTIMIZER.md (benchmarks/encoder_profiles.py).
+# - "fast": local previews and CI, lowest encode effort
+# - "balanced": near-max compression at a fraction of the encode time
+# - "max": smallest files for the final publish
+ENCODER_PROFILES = {
+    "fast": {
+        "jpeg": {"optimize": False, "progressive": False},
+        "png": {"compress_level": 1},
+        "webp": {"method": 0},
+        "avif": {"speed": 10},
+        "jxl": {"effort": 3},
+        "subsampling": {"photo": 2, "screenshot": 2, "graphic": 2}
+    },
+    "balanced": {
+        "jpeg": {"optimize": True, "progressive": False},
+        "png": {"compress_level": 6},
+        "webp": {"method": 4},
+        "avif": {"speed": 7},
+        "jxl": {"effort": 7},
+        "subsampling": {"photo": 2, "screenshot": 0, "graphic": 0}
+    },
+    "max": {
+        "jpeg": {"optimize": True, "progressive": True},
+        "png": {"optimize": True},
+        "webp": {"method": 6},
+        "avif": {"speed": 4},
+        "jxl": {"effort": 9},
+        "subsampling": {"photo": 2, "screenshot": 0, "graphic": 0}
     }
 }
+DEFAULT_ENCODER_PROFILE = "max"
 
 # File size thresholds (in bytes)
 LARGE_FILE_THRESHOLD = 1024 * 1024  # 1MB
@@ -31,5 +128,112 @@ SUPPORTED_FORMATS = {
     "output": [".jpg", ".png", ".webp"]
 }
 
+# Output formats for each kind of source image, in output order:
+# - "opaque": no transparency, JPEG plus lossy WebP
+# - "alpha": uses transparency, PNG plus WebP (lossless for graphics)
+# - "palette": palette images, palette PNG plus lossless WebP
+# Formats whose extension is not in SUPPORTED_FORMATS["output"] are skipped,
+# so AVIF and JPEG XL are only written when explicitly allowed.
+OUTPUT_FORMAT_RULES = {
+    "opaque": ["jpeg", "webp", "avif", "jxl"],
+    "alpha": ["png", "webp", "avif", "jxl"],
+    "palette": ["png", "webp"]
+}
+
+# Per-folder settings file. The nearest one found in the image's folder or
+# its parents can override SUPPORTED_FORMATS["output"], for example
+# {"output": [".png", ".webp"]}
+FOLDER_CONFIG_FILE = ".image_optimizer.json"
+
 # Backup folder name
-BACKUP_FOLDER = ".image_optimizer_backup"
\ No newline at end of file
+BACKUP_FOLDER = ".image_optimizer_backup"
+# Lossless re-compression of originals (recompress command). JPEGs are
+# re-optimized with jpegtran when it is installed; PNGs are re-deflated at
+# level 9 with each zlib strategy listed (0 default, 1 filtered, 3 RLE) and
+# the smallest result is kept.
+JPEGTRAN_COMMAND = "jpegtran"
+PNG_RECOMPRESS_STRATEGIES = [0, 1, 3]
+
+# Output pruning. Formats are listed fallback first (JPEG/PNG, then WebP,
+# AVIF). An output is only kept if its file size is below PRUNE_RATIO times
+# the smallest kept output earlier in that list for the same width. The first
+# format must likewise beat the original when both use the same codec.
+PRUNE_OUTPUTS = True
+PRUNE_RATIO = 0.95
+
+# How widths that resolve to the same dimensions (targets wider than the
+# source) are written. Each dimension is encoded once, for the smallest such
+# width; the other widths get a hardlink, a relative symlink, or only an
+# entry in a per-image manifest (<stem>_sizes.json) naming the encoded file.
+OUTPUT_LAYOUTS = ["hardlink", "symlink", "manifest"]
+DEFAULT_OUTPUT_LAYOUT = "hardlink"
+MANIFEST_SUFFIX = "_sizes.json"
+
+# Batch execution backends. Threads share one ImageProcessor; processes
+# each build their own, which avoids the GIL for NumPy and Python-side work
+# at the cost of starting workers.
+EXECUTORS = ["thread", "process"]
+DEFAULT_EXECUTOR = "thread"
+
+# Sources with at least this many pixels are decoded once into shared memory
+# and each output size is resized and encoded in its own process, cutting
+# latency for huge panoramas. 0 disables. Each processor keeps one pool of
+# SHARED_WORKERS processes for this (None: one per core), started with
+# SHARED_START_METHOD ("spawn" where forkserver is unavailable) because
+# forking a multi-threaded parent is unsafe. Only 8-bit modes are shared.
+# Batch process workers split the cores as for ENCODE_WORKERS. The decoded
+# source is copied into the block in bands of about SHARED_COPY_BAND_BYTES,
+# so the copy never needs a second full-size buffer.
+SHARED_MIN_PIXELS = 40_000_000
+SHARED_WORKERS = None
+SHARED_MODES = ["L", "LA", "RGB", "RGBA"]
+SHARED_START_METHOD = "forkserver"
+SHARED_COPY_BAND_BYTES = 64 * 1024 * 1024
+
+# Batch engines. "pool" runs process_image once per file on the executor;
+# "pipeline" splits each image into read, decode, resize and encode stages
+# with their own threads and bounded queues, plus one writer thread for all
+# output I/O (backups, encoded files, links, pruning, manifests).
+ENGINES = ["pool", "pipeline"]
+DEFAULT_ENGINE = "pool"
+PIPELINE_STAGE_WORKERS = {"read": 2, "decode": 2, "resize": 2, "encode": 4}
+PIPELINE_QUEUE_SIZE = 8
+
+# Images processed at once by BatchProcessor.process_folder_async when no
+# concurrency is given
+ASYNC_CONCURRENCY = 4
+
+# Threads encoding one image's outputs at once (None: one per core). The
+# pool is shared by everything using the same ImageProcessor; batch process
+# workers each get cores // workers so they do not oversubscribe the CPU.
+ENCODE_WORKERS = None
+
+# Sources with at least this many pixels are resized as horizontal strips on
+# TILE_WORKERS threads (None: one per core). Each strip is read with enough
+# overlap for the LANCZOS kernel, so results match a single resize call to
+# within rounding. 0 disables. Shared-memory workers resize without strips,
+# and batch process workers split the cores as for ENCODE_WORKERS.
+TILE_MIN_PIXELS = 50_000_000
+TILE_WORKERS = None
+TILE_MODES = ["L", "LA", "RGB", "RGBA", "I", "F"]
+LANCZOS_SUPPORT = 3.0
+
+# Batch memory budget in bytes (None: no limit). Before decoding, each
+# image's memory is estimated from its header as width x height x bands
+# (bytes per band for 16- and 32-bit modes) and work is only started while
+# the estimates in flight stay within the budget. An image estimated above
+# the whole budget runs on its own.
+MEMORY_BUDGET = None
+
+# Order in which batch runs start files (see scheduling.py). "path" keeps
+# the sorted path order; the others probe each file's header first.
+# "savings" assumes outputs cost SAVINGS_OUTPUT_BITS_PER_PIXEL on average.
+DEFAULT_SCHEDULE = "path"
+SAVINGS_OUTPUT_BITS_PER_PIXEL = 2.0
+
+# Folder discovery (utils.iter_image_files). Files and folders matching any
+# of these glob patterns, by name or by path relative to the folder being
+# processed, are skipped. When files are streamed into a batch as they are
+# found, at most IN_FLIGHT_PER_WORKER files per worker are queued at once.
+IGNORE_PATTERNS = []
+IN_FLIGHT_PER_WORKER = 2
@@ -2,10 +2,23 @@
 Core image processing functionality
 """
 
+import asyncio
+import functools
+import io
+import json
+import math
+import multiprocessing
 import os
 import shutil
+import struct
+import subprocess
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from multiprocessing import shared_memory
 from pathlib import Path
-from PIL import Image, ImageOps
+from PIL import Image, ImageSequence, PngImagePlugin
+import numpy as np
 import logging
 
 from .utils import (
@@ -15,9 +28,115 @@ from .utils import (
     create_backup_path,
     format_file_size,
     get_file_size,
-    calculate_size_reduction
+    calculate_size_reduction,
+    calculate_ssim,
+    get_image_kind,
+    select_output_formats,
+    get_folder_output_formats
 )
-from .config import DEFAULT_SIZES, BACKUP_FOLDER, SUPPORTED_FORMATS
+from .config import (
+    DEFAULT_SIZES,
+    BACKUP_FOLDER,
+    SUPPORTED_FORMATS,
+    RESIZE_MODES,
+    DEFAULT_RESIZE_MODE,
+    RESAMPLING_PRESETS,
+    DEFAULT_RESAMPLING,
+    DRAFT_DECODE,
+    DRAFT_REDUCING_GAP,
+    ENCODER_PROFILES,
+    DEFAULT_ENCODER_PROFILE,
+    QUALITY_SEARCH_RANGE,
+    QUALITY_SEARCH_MAX_TRIALS,
+    ANIMATION_DEDUPE_TOLERANCE,
+    DEFAULT_FRAME_DURATION,
+    JPEGTRAN_COMMAND,
+    PNG_RECOMPRESS_STRATEGIES,
+    PRUNE_OUTPUTS,
+    PRUNE_RATIO,
+    OUTPUT_LAYOUTS,
+    DEFAULT_OUTPUT_LAYOUT,
+    MANIFEST_SUFFIX,
+    SHARED_MIN_PIXELS,
+    SHARED_WORKERS,
+    SHARED_MODES,
+    SHARED_START_METHOD,
+    SHARED_COPY_BAND_BYTES,
+    ENCODE_WORKERS,
+    TILE_MIN_PIXELS,
+    TILE_WORKERS,
+    TILE_MODES,
+    LANCZOS_SUPPORT
+)
+from .codecs import get_codec
+
+# Lossless transpose operations for each EXIF orientation value
+ORIENTATION_TRANSFORMS = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90
+}
+
+# Transforms that swap width and height
+SWAPPING_TRANSFORMS = {
+    Image.Transpose.TRANSPOSE,
+    Image.Transpose.ROTATE_270,
+    Image.Transpose.TRANSVERSE,
+    Image.Transpose.ROTATE_90
+}
+
+def _encode_from_shared_memory(processor, memory_name, shape, mode, transform, image_path,
+                               width, dimensions, formats, encode_kwargs):
+    """
+    Resize and encode one output size from a source in shared memory
+    
+    Runs in a worker process started by ImageProcessor._encode_shared.
+    Every worker process already has a core of its own, so the resize does
+    not start a tile pool as well.
+    
+    Returns:
+        Dictionary mapping format name to output information
+    """
+    processor.tile_workers = 1
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        pixels = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+        source = Image.frombuffer(mode, (shape[1], shape[0]), pixels, "raw", mode, 0, 1)
+        
+        # Output dimensions are oriented, resizing happens before the transform
+        frame, resampling = processor._resize(source, processor._get_oriented_size(dimensions, transform))
+        del source, pixels
+        if transform is not None:
+            frame = frame.transpose(transform)
+        
+        return processor._encode_frame(
+            frame, image_path, width, dimensions, resampling, formats, False, **encode_kwargs
+        )
+    finally:
+        memory.close()
+
+
+def _process_in_worker(processor, image_path, process_kwargs):
+    """
+    Run process_image on a processor sent to a worker process
+    
+    Used by ImageProcessor.process_image_async with a process pool.
+    
+    Returns:
+        Tuple of (processing results, statistics added by this call)
+    """
+    processor.reset_stats()
+    result = processor.process_image(image_path, **process_kwargs)
+    return result, processor.stats
+
+
+class ProcessingCancelled(Exception):
+    """Raised inside a worker when a caller cancels processing"""
+
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -27,17 +146,48 @@ logger = logging.getLogger(__name__)
 class ImageProcessor:
     """Core image processing class"""
     
-    def __init__(self, backup=True, backup_folder=None):
+    def __init__(self, backup=True, backup_folder=None, resize_mode=None, draft=None, resampling=None,
+                 encoder_profile=None, prune=None, prune_ratio=None, layout=None, shared_min_pixels=None,
+                 shared_workers=None, encode_workers=None, tile_min_pixels=None, tile_workers=None):
         self.backup = backup
         self.backup_folder = backup_folder or BACKUP_FOLDER
+        self.resize_mode = resize_mode or DEFAULT_RESIZE_MODE
+        self.draft = DRAFT_DECODE if draft is None else draft
+        self.resampling = resampling or DEFAULT_RESAMPLING
+        self.encoder_profile = encoder_profile or DEFAULT_ENCODER_PROFILE
+        self.prune = PRUNE_OUTPUTS if prune is None else prune
+        self.prune_ratio = PRUNE_RATIO if prune_ratio is None else prune_ratio
+        self.layout = layout or DEFAULT_OUTPUT_LAYOUT
+        self.shared_min_pixels = SHARED_MIN_PIXELS if shared_min_pixels is None else shared_min_pixels
+        self.shared_workers = shared_workers or SHARED_WORKERS
+        self._shared_pool = None
+        self.encode_workers = encode_workers or ENCODE_WORKERS or os.cpu_count() or 1
+        self._encode_pool = None
+        self.tile_min_pixels = TILE_MIN_PIXELS if tile_min_pixels is None else tile_min_pixels
+        self.tile_workers = tile_workers or TILE_WORKERS or os.cpu_count() or 1
+        self._tile_pool = None
+        if self.resize_mode not in RESIZE_MODES:
+            raise ValueError(f"Unsupported resize mode: {self.resize_mode}")
+        if self.resampling not in RESAMPLING_PRESETS:
+            raise ValueError(f"Unsupported resampling preset: {self.resampling}")
+        if self.encoder_profile not in ENCODER_PROFILES:
+            raise ValueError(f"Unsupported encoder profile: {self.encoder_profile}")
+        if self.layout not in OUTPUT_LAYOUTS:
+            raise ValueError(f"Unsupported output layout: {self.layout}")
+        if not 0 < self.prune_ratio <= 1:
+            raise ValueError(f"Prune ratio must be in (0, 1]: {self.prune_ratio}")
         self.stats = {
             "processed": 0,
             "original_size": 0,
             "optimized_size": 0,
             "files_created": 0
         }
+        # Batch threads share one processor
+        self._stats_lock = threading.Lock()
     
-    def process_image(self, image_path, sizes=None, quality=None, generate_webp=True, dry_run=False):
+    def process_image(self, image_path, sizes=None, quality=None, generate_webp=True, dry_run=False,
+                      target_ssim=None, max_bytes=None, output_formats=None, source_data=None,
+                      cancel_event=None):
         """
         Process a single image file
         
@@ -47,92 +197,907 @@ class ImageProcessor:
             quality: Override quality setting (0-100)
             generate_webp: Whether to generate WebP versions
             dry_run: If True, only show what would be done
+            target_ssim: Search for the lowest quality whose SSIM against
+                the resized frame is at least this value
+            max_bytes: Search for the highest quality that fits this many
+                bytes; either an int or a dict mapping width to bytes
+            output_formats: Allowed output extensions or codec names,
+                overriding SUPPORTED_FORMATS["output"] and per-folder settings
+            source_data: Bytes of the file if already read, so it is not
+                read again
+            cancel_event: threading.Event checked between output sizes;
+                once set, processing stops with ProcessingCancelled
         
         Returns:
             Dictionary with processing results
         """
         image_path = Path(image_path)
+        results = self._new_results(image_path, target_ssim, max_bytes)
+        
+        # Create backup if needed
+        if self.backup and not dry_run:
+            results["backup_created"] = self._create_backup(image_path)
+        
+        # Process the image
+        try:
+            source_file = io.BytesIO(source_data) if source_data is not None else image_path
+            with Image.open(source_file) as source:
+                plan = self._plan_image(
+                    source, image_path, results, sizes, quality, generate_webp, dry_run,
+                    target_ssim, max_bytes, output_formats
+                )
+                
+                if plan["animated"]:
+                    outputs, results["animation"] = self._encode_animation(
+                        source, image_path, plan["output_sizes"], plan["formats"], plan["transform"],
+                        quality, plan["content_type"], plan["lossless"], dry_run,
+                        cancel_event=cancel_event
+                    )
+                else:
+                    outputs = self._encode_still(
+                        self._to_full_colour(source), image_path, plan["output_sizes"], plan["formats"],
+                        plan["transform"], quality, plan["content_type"], dry_run,
+                        target_ssim=target_ssim, max_bytes=max_bytes,
+                        lossless=plan["lossless"], keep_palette=plan["keep_palette"],
+                        cancel_event=cancel_event
+                    )
+                
+                return self._finish_image(results, plan, outputs)
+        
+        except ProcessingCancelled:
+            logger.info(f"Cancelled processing {image_path}")
+            raise
+        except Exception as e:
+            logger.error(f"Error processing {image_path}: {str(e)}")
+            raise
+    
+    def _new_results(self, image_path, target_ssim=None, max_bytes=None):
+        """
+        Validate a source and its options and start its results dictionary
+        
+        Raises:
+            FileNotFoundError: If the image does not exist
+            ValueError: For unsupported formats or conflicting targets
+        """
         if not image_path.exists():
             raise FileNotFoundError(f"Image not found: {image_path}")
         
         if not image_path.suffix.lower() in SUPPORTED_FORMATS["input"]:
             raise ValueError(f"Unsupported image format: {image_path.suffix}")
         
-        sizes = sizes or DEFAULT_SIZES
+        if target_ssim is not None and max_bytes is not None:
+            raise ValueError("Use either target_ssim or max_bytes, not both")
         
-        results = {
+        return {
             "original_path": str(image_path),
             "original_size": get_file_size(image_path),
             "outputs": [],
             "backup_created": False
         }
+    
+    def _plan_image(self, source, image_path, results, sizes, quality, generate_webp, dry_run,
+                    target_ssim, max_bytes, output_formats):
+        """
+        Read the header and sample the pixels of an open source to decide
+        the output sizes, formats and encoder settings
+        
+        Records orientation, decoded size, content type and image kind in
+        results.
+        
+        Returns:
+            Dictionary describing how to encode the image
+        """
+        # Read the orientation tag only; it is applied to each
+        # resized frame rather than to the full-resolution source
+        orientation = self._get_orientation(source)
+        transform = ORIENTATION_TRANSFORMS.get(orientation)
+        results["orientation"] = orientation
+        results["transform"] = transform.name if transform is not None else None
+        
+        # Output sizes are based on the orientation-corrected header
+        # size, before any pixels are decoded
+        corrected_size = self._get_oriented_size(source.size, transform)
+        output_sizes = calculate_output_sizes(corrected_size, sizes or DEFAULT_SIZES)
         
-        # Detect content type for quality optimization
-        content_type = detect_content_type(image_path)
+        if self.draft and not dry_run:
+            self._apply_draft(source, output_sizes, transform)
+        results["decoded_size"] = source.size
+        
+        # Detect content type for quality optimization, reusing the
+        # (possibly draft-scaled) decode of the open image. Transparent
+        # images are judged by their visible pixels, so a transparent
+        # photo still gets photo settings and lossy WebP.
+        image_kind = get_image_kind(source)
+        content_type = detect_content_type(image_path, img=source, ignore_alpha=image_kind == "alpha")
+        results["content_type"] = content_type
         logger.info(f"Processing {image_path.name} (detected as: {content_type})")
         
-        # Create backup if needed
-        if self.backup and not dry_run:
-            backup_path = create_backup_path(image_path, self.backup_folder)
-            shutil.copy2(image_path, backup_path)
-            results["backup_created"] = True
-            logger.info(f"Created backup: {backup_path}")
+        # Choose output formats from the image mode and content
+        allowed = output_formats or get_folder_output_formats(image_path.parent)
+        formats = select_output_formats(image_kind, allowed)
+        if not generate_webp:
+            formats = [f for f in formats if f != "webp"]
+        results["image_kind"] = image_kind
         
-        # Process the image
+        # Animated sources keep every frame in formats that can
+        # store animation
+        animated_formats = [f for f in formats if get_codec(f).supports_animation]
+        animated = getattr(source, "n_frames", 1) > 1 and bool(animated_formats)
+        if animated:
+            formats = animated_formats
+        
+        return {
+            "image_path": image_path,
+            "output_sizes": output_sizes,
+            "formats": formats,
+            "transform": transform,
+            "quality": quality,
+            "content_type": content_type,
+            "dry_run": dry_run,
+            "target_ssim": target_ssim,
+            "max_bytes": max_bytes,
+            "animated": animated,
+            # Transparent graphics and palette images get lossless WebP,
+            # and palette images are quantized back for PNG output
+            "lossless": image_kind != "opaque" and content_type != "photo",
+            "keep_palette": image_kind == "palette"
+        }
+    
+    def _to_full_colour(self, source):
+        """Convert palette sources so they resize in full colour rather than nearest-neighbour"""
+        if source.mode == "P":
+            has_alpha = "transparency" in source.info
+            return source.convert("RGBA" if has_alpha else "RGB")
+        return source
+    
+    def _finish_image(self, results, plan, outputs):
+        """
+        Prune, order and report encoded outputs, and update statistics
+        
+        Returns:
+            The completed results dictionary
+        """
+        image_path = plan["image_path"]
+        dry_run = plan["dry_run"]
+        
+        # Drop outputs that do not beat a more compatible alternative
+        if self.prune and not dry_run:
+            results["pruned"] = self._prune_outputs(
+                outputs, plan["formats"], plan["output_sizes"], image_path, results["original_size"]
+            )
+        
+        # Report outputs grouped by format, in requested size order
+        for format_name in plan["formats"]:
+            for width in plan["output_sizes"]:
+                if (format_name, width) in outputs:
+                    results["outputs"].append(outputs[(format_name, width)])
+        
+        if self.layout == "manifest" and not dry_run:
+            results["manifest"] = self._write_manifest(image_path, outputs)
+        
+        # Update statistics
+        if not dry_run:
+            self._update_stats(results)
+        
+        return results
+    
+    async def process_image_async(self, image_path, executor=None, semaphore=None, **process_kwargs):
+        """
+        Process a single image without blocking the event loop
+        
+        The source is read and processed on executor (the loop's default
+        thread pool if None). Cancelling the call stops a running thread
+        worker before its next output size; files already written are kept.
+        With a ProcessPoolExecutor the work runs on a copy of this processor
+        and the statistics it adds are merged back when it finishes.
+        
+        Args:
+            image_path: Path to the image file
+            executor: concurrent.futures executor to run the work on
+            semaphore: asyncio.Semaphore shared by calls to limit how many
+                images are processed at once
+            **process_kwargs: Arguments accepted by process_image()
+        
+        Returns:
+            Dictionary with processing results
+        """
+        loop = asyncio.get_running_loop()
+        image_path = Path(image_path)
+        
+        async with semaphore or nullcontext():
+            source_data = await loop.run_in_executor(executor, image_path.read_bytes)
+            
+            # Events cannot be sent to worker processes; they can only be
+            # cancelled before they start
+            if isinstance(executor, ProcessPoolExecutor):
+                result, stats = await loop.run_in_executor(
+                    executor, _process_in_worker, self, image_path,
+                    {**process_kwargs, "source_data": source_data}
+                )
+                self.merge_stats(stats)
+                return result
+            
+            cancel_event = threading.Event()
+            call = functools.partial(
+                self.process_image, image_path, source_data=source_data,
+                cancel_event=cancel_event, **process_kwargs
+            )
+            try:
+                return await loop.run_in_executor(executor, call)
+            except asyncio.CancelledError:
+                cancel_event.set()
+                raise
+    
+    def recompress_image(self, image_path, dry_run=False):
+        """
+        Losslessly re-encode an original file in place
+        
+        JPEGs get optimized Huffman tables from jpegtran, PNGs are re-deflated
+        at maximum compression. Non-essential metadata is dropped; EXIF
+        orientation and ICC profiles are kept. The original is only replaced
+        (after a backup) when the result is smaller.
+        
+        Args:
+            image_path: Path to the image file
+            dry_run: If True, only report what would be saved
+        
+        Returns:
+            Dictionary with recompression results
+        """
+        image_path = Path(image_path)
+        if not image_path.exists():
+            raise FileNotFoundError(f"Image not found: {image_path}")
+        
+        original_size = get_file_size(image_path)
+        results = {
+            "original_path": str(image_path),
+            "original_size": original_size,
+            "recompressed_size": original_size,
+            "bytes_saved": 0,
+            "replaced": False,
+            "backup_created": False,
+            "outputs": []
+        }
+        
+        suffix = image_path.suffix.lower()
+        if suffix in (".jpg", ".jpeg"):
+            data, skipped = self._recompress_jpeg(image_path)
+        elif suffix == ".png":
+            data, skipped = self._recompress_png(image_path)
+        else:
+            data, skipped = None, f"{suffix} is not supported"
+        
+        if data is None:
+            results["skipped"] = skipped
+            logger.info(f"Skipped {image_path.name}: {skipped}")
+        elif len(data) < original_size:
+            results["recompressed_size"] = len(data)
+            results["bytes_saved"] = original_size - len(data)
+            if not dry_run:
+                if self.backup:
+                    results["backup_created"] = self._create_backup(image_path)
+                
+                # Write beside the original and swap, so a failed write
+                # never leaves a truncated file
+                temp_path = image_path.with_name(f".{image_path.name}.tmp")
+                temp_path.write_bytes(data)
+                os.replace(temp_path, image_path)
+                results["replaced"] = True
+                logger.info(f"Recompressed {image_path.name}, saved {format_file_size(results['bytes_saved'])}")
+        
+        # The rewritten original counts as the optimized size
+        if not dry_run:
+            self.merge_stats({
+                "processed": 1,
+                "original_size": original_size,
+                "optimized_size": results["recompressed_size"]
+            })
+        
+        return results
+    
+    def _recompress_jpeg(self, image_path):
+        """
+        Re-optimize a JPEG's Huffman tables without decoding it
+        
+        Returns:
+            Tuple of (encoded bytes or None, reason when skipped)
+        """
+        if shutil.which(JPEGTRAN_COMMAND) is None:
+            return None, f"{JPEGTRAN_COMMAND} not found"
+        
+        with Image.open(image_path) as img:
+            orientation = self._get_orientation(img)
+            has_icc = "icc_profile" in img.info
+        
+        # Keep EXIF when it carries the orientation, otherwise strip it
+        if orientation not in (None, 1):
+            copy = "all"
+        elif has_icc:
+            copy = "icc"
+        else:
+            copy = "none"
+        
+        command = [JPEGTRAN_COMMAND, "-copy", copy, "-optimize", str(image_path)]
+        try:
+            completed = subprocess.run(command, capture_output=True, check=True)
+        except subprocess.CalledProcessError as e:
+            if copy != "icc":
+                return None, f"{JPEGTRAN_COMMAND} failed: {e.stderr.decode(errors='replace').strip()}"
+            # jpegtran builds older than libjpeg-turbo 2.1 lack -copy icc;
+            # keeping all markers still keeps the profile
+            logger.info(f"{JPEGTRAN_COMMAND} does not accept -copy icc, retrying with -copy all")
+            command = [JPEGTRAN_COMMAND, "-copy", "all", "-optimize", str(image_path)]
+            try:
+                completed = subprocess.run(command, capture_output=True, check=True)
+            except subprocess.CalledProcessError as e:
+                return None, f"{JPEGTRAN_COMMAND} failed: {e.stderr.decode(errors='replace').strip()}"
+        return completed.stdout, None
+    
+    def _recompress_png(self, image_path):
+        """
+        Re-deflate a PNG with each configured zlib strategy
+        
+        Pillow chooses a row filter adaptively at every level, so the
+        strategies are what is varied. Text chunks are dropped; EXIF is only
+        kept when it carries the orientation, as for JPEGs, and the colour
+        chunks (ICC profile, gAMA, sRGB, cHRM) are kept.
+        
+        Returns:
+            Tuple of (smallest encoded bytes or None, reason when skipped)
+        """
+        with Image.open(image_path) as img:
+            if getattr(img, "n_frames", 1) > 1:
+                return None, "animated PNG"
+            img.load()
+            
+            # Only the chunks needed to render the same pixels are kept
+            save_kwargs = {"compress_level": 9}
+            for key in ("transparency", "icc_profile"):
+                if key in img.info:
+                    save_kwargs[key] = img.info[key]
+            if self._get_orientation(img) not in (None, 1):
+                save_kwargs["exif"] = img.getexif()
+            
+            # Pillow reads gAMA, sRGB and cHRM but only writes them from
+            # raw chunks, in units of 1/100000
+            colour = PngImagePlugin.PngInfo()
+            if "gamma" in img.info:
+                colour.add(b"gAMA", struct.pack(">I", round(img.info["gamma"] * 100000)))
+            if "srgb" in img.info:
+                colour.add(b"sRGB", bytes([img.info["srgb"]]))
+            if "chromaticity" in img.info:
+                colour.add(b"cHRM", struct.pack(
+                    ">8I", *(round(value * 100000) for value in img.info["chromaticity"])
+                ))
+            if colour.chunks:
+                save_kwargs["pnginfo"] = colour
+            
+            best = None
+            for strategy in PNG_RECOMPRESS_STRATEGIES:
+                buffer = io.BytesIO()
+                img.save(buffer, format="PNG", compress_type=strategy, **save_kwargs)
+                if best is None or buffer.tell() < len(best):
+                    best = buffer.getvalue()
+            
+            # Refuse to write anything that does not decode identically
+            with Image.open(io.BytesIO(best)) as candidate:
+                if candidate.mode != img.mode or candidate.tobytes() != img.tobytes():
+                    return None, "re-encoded pixels differ"
+        
+        return best, None
+    
+    def _create_backup(self, image_path):
+        """Copy the original into the backup folder"""
+        backup_path = create_backup_path(image_path, self.backup_folder)
+        shutil.copy2(image_path, backup_path)
+        logger.info(f"Created backup: {backup_path}")
+        return True
+    
+    def _encode_still(self, img, image_path, output_sizes, formats, transform, quality,
+                      content_type, dry_run, target_ssim=None, max_bytes=None,
+                      lossless=False, keep_palette=False, frames=None, defer=None, cancel_event=None):
+        """
+        Resize each frame once and hand it to every encoder
+        
+        Sources of at least shared_min_pixels are handed to
+        _encode_shared instead.
+        
+        Args:
+            frames: Already resized (width, frame, resampling) tuples, as
+                yielded by _resize_frames
+            defer: Callable taking (function, *args) that runs file writes
+                and links later, in order; files are written directly
+                without it
+            cancel_event: threading.Event checked before each output size
+        
+        Returns:
+            Dictionary mapping (format, width) to output information
+        """
+        encode_kwargs = {
+            "quality": quality,
+            "content_type": content_type,
+            "target_ssim": target_ssim,
+            "lossless": lossless,
+            "keep_palette": keep_palette
+        }
+        if frames is None and self._uses_shared_memory(img, dry_run):
+            return self._encode_shared(
+                img, image_path, output_sizes, formats, transform, max_bytes, encode_kwargs, cancel_event
+            )
+        
+        write = None
+        if defer is not None:
+            def write(output_path, data):
+                defer(self._write_output, Path(output_path), data)
+        
+        # Each (width, format) encode is submitted as soon as its frame is
+        # resized, so encodes overlap with each other and with resizing
+        pending = {}
+        aliases = []
+        submitted = {}
+        if frames is None:
+            frames = self._resize_frames(img, output_sizes, dry_run, transform)
+        for width, frame, resampling in frames:
+            if cancel_event is not None and cancel_event.is_set():
+                raise ProcessingCancelled(f"Cancelled before the {width}px output of {image_path}")
+            
+            dimensions = output_sizes[width]
+            byte_budget = max_bytes.get(width) if isinstance(max_bytes, dict) else max_bytes
+            
+            # Widths capped at the source size share one encode
+            key = (dimensions, byte_budget)
+            if key in pending:
+                aliases.append((width, key))
+                continue
+            
+            # Image.save keeps its options on the image while it runs, so a
+            # frame object already submitted (for another format, or for a
+            # width with the same dimensions) is copied before each encode
+            futures = {}
+            for format_name in formats:
+                if not (dry_run or self.encode_workers == 1) and id(frame) in submitted:
+                    frame_copy = frame.copy()
+                else:
+                    frame_copy = submitted.setdefault(id(frame), frame)
+                futures[format_name] = self._submit_encode(
+                    cancel_event, self._encode_frame, frame_copy,
+                    image_path, width, dimensions, resampling,
+                    [format_name], dry_run, max_bytes=byte_budget, write=write, **encode_kwargs
+                )
+            pending[key] = (width, futures)
+        
+        outputs = {}
+        encoded = {}
+        for key, (width, futures) in pending.items():
+            encoded[key] = {
+                format_name: future.result()[format_name]
+                for format_name, future in futures.items()
+            }
+            outputs.update(
+                ((format_name, width), output) for format_name, output in encoded[key].items()
+            )
+        
+        for width, key in aliases:
+            for format_name in formats:
+                outputs[(format_name, width)] = self._alias_output(
+                    encoded[key][format_name], image_path, width, dry_run, defer
+                )
+        
+        return outputs
+    
+    def _submit_encode(self, cancel_event, function, *args, **kwargs):
+        """
+        Run an encode on the shared encode pool, or inline with one worker
+        
+        Encodes that have not started when cancel_event is set raise
+        ProcessingCancelled instead of running.
+        
+        Returns:
+            concurrent.futures.Future with the result
+        """
+        def run():
+            if cancel_event is not None and cancel_event.is_set():
+                raise ProcessingCancelled("Cancelled before encoding")
+            return function(*args, **kwargs)
+        
+        if self.encode_workers > 1:
+            with self._stats_lock:
+                if self._encode_pool is None:
+                    self._encode_pool = ThreadPoolExecutor(
+                        max_workers=self.encode_workers, thread_name_prefix="encode"
+                    )
+            return self._encode_pool.submit(run)
+        
+        future = Future()
+        try:
+            future.set_result(run())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def _uses_shared_memory(self, img, dry_run=False):
+        """Check whether a still source is large enough for _encode_shared"""
+        return (not dry_run and bool(self.shared_min_pixels)
+                and img.width * img.height >= self.shared_min_pixels
+                and img.mode in SHARED_MODES)
+    
+    def _encode_frame(self, frame, image_path, width, dimensions, resampling, formats, dry_run,
+                      quality=None, content_type="photo", target_ssim=None, max_bytes=None,
+                      lossless=False, keep_palette=False, write=None):
+        """
+        Encode one resized frame in every output format
+        
+        With write, each file is encoded in memory and write(output_path,
+        data) is called instead of saving to disk.
+        
+        Returns:
+            Dictionary mapping format name to output information
+        """
+        outputs = {}
+        for format_name in formats:
+            output_path = self._create_output_path(
+                image_path, width, get_codec(format_name).extension
+            )
+            
+            encoding = {}
+            file_size = 0
+            if not dry_run:
+                if write is None:
+                    self._clear_output(output_path)
+                target = io.BytesIO() if write is not None else output_path
+                encoding = self._save_image(
+                    frame, target, format_name, 
+                    quality, content_type,
+                    target_ssim=target_ssim, max_bytes=max_bytes,
+                    lossless=lossless, keep_palette=keep_palette
+                )
+                if write is not None:
+                    file_size = target.tell()
+                    write(output_path, target.getvalue())
+                else:
+                    file_size = get_file_size(output_path)
+            
+            outputs[format_name] = {
+                "path": str(output_path),
+                "size": dimensions,
+                "format": format_name,
+                "file_size": file_size,
+                "resampling": resampling,
+                **encoding
+            }
+        
+        return outputs
+    
+    def _encode_shared(self, img, image_path, output_sizes, formats, transform, max_bytes, encode_kwargs,
+                       cancel_event=None):
+        """
+        Decode a large source once into shared memory and resize and encode
+        each distinct output size in its own process
+        
+        Workers map the buffer instead of receiving pickled pixels, and apply
+        the orientation transform to their resized frame. The source is
+        copied into the block in row bands of about SHARED_COPY_BAND_BYTES.
+        cancel_event is checked before each band and before each job is
+        submitted or collected.
+        
+        Returns:
+            Dictionary mapping (format, width) to output information
+        """
+        img.load()
+        shape = (img.height, img.width, len(img.getbands()))
+        memory = shared_memory.SharedMemory(create=True, size=img.width * img.height * shape[2])
         try:
-            with Image.open(image_path) as img:
-                # Apply EXIF orientation FIRST before any calculations
-                img = self._fix_image_orientation(img)
-                corrected_size = img.size
+            pixels = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+            band_rows = max(1, SHARED_COPY_BAND_BYTES // (img.width * shape[2]))
+            for top in range(0, img.height, band_rows):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ProcessingCancelled(f"Cancelled while sharing the pixels of {image_path}")
+                bottom = min(top + band_rows, img.height)
+                band = img.crop((0, top, img.width, bottom))
+                pixels[top:bottom] = np.asarray(band).reshape((bottom - top,) + shape[1:])
+                del band
+            del pixels
+            # The decoded source is no longer needed in this process
+            mode = img.mode
+            img.close()
+            
+            jobs = {}
+            for width, dimensions in output_sizes.items():
+                byte_budget = max_bytes.get(width) if isinstance(max_bytes, dict) else max_bytes
+                jobs.setdefault((dimensions, byte_budget), []).append(width)
+            
+            executor = self._get_shared_pool()
+            logger.info(f"Encoding {image_path.name} from shared memory in {len(jobs)} jobs")
+            futures = {}
+            try:
+                for key, widths in jobs.items():
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ProcessingCancelled(f"Cancelled before the {widths[0]}px output of {image_path}")
+                    futures[key] = executor.submit(
+                        _encode_from_shared_memory, self, memory.name, shape, mode,
+                        transform, image_path, widths[0], key[0], formats,
+                        {**encode_kwargs, "max_bytes": key[1]}
+                    )
                 
-                output_sizes = calculate_output_sizes(corrected_size, sizes)
+                outputs = {}
+                for key, widths in jobs.items():
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise ProcessingCancelled(f"Cancelled before the {widths[0]}px output of {image_path}")
+                    encoded = futures[key].result()
+                    for format_name in formats:
+                        outputs[(format_name, widths[0])] = encoded[format_name]
+                        for width in widths[1:]:
+                            outputs[(format_name, width)] = self._alias_output(
+                                encoded[format_name], image_path, width, False
+                            )
+            finally:
+                # Jobs that have not started are dropped, and every running
+                # job must finish before the block is unlinked
+                for future in futures.values():
+                    future.cancel()
+                wait(futures.values())
+        finally:
+            memory.close()
+            memory.unlink()
+        
+        return outputs
+    
+    def _get_shared_pool(self):
+        """
+        Get the process pool for _encode_shared, creating it on first use
+        
+        The pool is kept for the processor's lifetime. Workers are started
+        with SHARED_START_METHOD rather than fork, because forking a parent
+        that is already running encode, tile and batch threads can leave a
+        child holding a lock no thread will release.
+        """
+        with self._stats_lock:
+            if self._shared_pool is None:
+                method = SHARED_START_METHOD
+                if method not in multiprocessing.get_all_start_methods():
+                    method = "spawn"
+                self._shared_pool = ProcessPoolExecutor(
+                    max_workers=self.shared_workers or os.cpu_count() or 1,
+                    mp_context=multiprocessing.get_context(method)
+                )
+            return self._shared_pool
+    
+    def _encode_animation(self, img, image_path, output_sizes, formats, transform, quality,
+                          content_type, lossless, dry_run, cancel_event=None):
+        """
+        Resize every frame of an animation and encode animated outputs
+        
+        Frames are streamed from the source. A frame in which no pixel
+        differs from the last kept frame by more than
+        ANIMATION_DEDUPE_TOLERANCE is merged into it, adding its duration.
+        
+        Returns:
+            Tuple of (dictionary mapping (format, width) to output
+            information, animation summary)
+        """
+        source_frames = img.n_frames
+        original_size = get_file_size(image_path)
+        # A GIF without a loop extension plays once; 0 means forever
+        loop = img.info.get("loop", 1)
+        
+        frames = {}
+        durations = []
+        previous = None
+        if not dry_run:
+            # Widths with the same dimensions share resized frames
+            targets = set(
+                self._get_oriented_size(dimensions, transform)
+                for dimensions in output_sizes.values()
+            )
+            frames = {dimensions: [] for dimensions in targets}
+            
+            for frame in ImageSequence.Iterator(img):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ProcessingCancelled(f"Cancelled while resizing frames of {image_path}")
                 
-                # Generate responsive sizes
-                for width, dimensions in output_sizes.items():
-                    output_path = self._create_output_path(image_path, width, "jpg")
-                    
-                    if not dry_run:
-                        self._save_resized_image(
-                            img, dimensions, output_path, "jpeg", 
-                            quality, content_type
-                        )
-                    
-                    output_info = {
-                        "path": str(output_path),
-                        "size": dimensions,
-                        "format": "jpeg",
-                        "file_size": 0 if dry_run else get_file_size(output_path)
-                    }
-                    results["outputs"].append(output_info)
+                duration = frame.info.get("duration", DEFAULT_FRAME_DURATION) or DEFAULT_FRAME_DURATION
+                frame = frame.convert("RGBA")
+                pixels = np.asarray(frame, dtype=np.int16)
                 
-                # Generate WebP versions
-                if generate_webp:
-                    for width, dimensions in output_sizes.items():
-                        output_path = self._create_output_path(image_path, width, "webp")
-                        
-                        if not dry_run:
-                            self._save_resized_image(
-                                img, dimensions, output_path, "webp", 
-                                quality, content_type
-                            )
-                        
-                        output_info = {
-                            "path": str(output_path),
-                            "size": dimensions,
-                            "format": "webp",
-                            "file_size": 0 if dry_run else get_file_size(output_path)
-                        }
-                        results["outputs"].append(output_info)
+                if previous is not None and np.abs(pixels - previous).max() <= ANIMATION_DEDUPE_TOLERANCE:
+                    durations[-1] += duration
+                    continue
+                
+                previous = pixels
+                durations.append(duration)
+                for dimensions in targets:
+                    resized, resampling = self._resize(frame, dimensions)
+                    if transform is not None:
+                        resized = resized.transpose(transform)
+                    frames[dimensions].append(resized)
+        
+        output_frames = len(durations) if not dry_run else source_frames
+        outputs = {}
+        encoded = {}
+        for width, dimensions in output_sizes.items():
+            if cancel_event is not None and cancel_event.is_set():
+                raise ProcessingCancelled(f"Cancelled before the {width}px output of {image_path}")
+            
+            for format_name in formats:
+                # Widths capped at the source size share one encode
+                if (dimensions, format_name) in encoded:
+                    outputs[(format_name, width)] = self._alias_output(
+                        encoded[(dimensions, format_name)], image_path, width, dry_run
+                    )
+                    continue
+                
+                codec = get_codec(format_name)
+                output_path = self._create_output_path(image_path, width, codec.extension)
                 
-                # Update statistics
+                encoding = {}
                 if not dry_run:
-                    self._update_stats(results)
+                    sequence = frames[self._get_oriented_size(dimensions, transform)]
+                    encoding = self._save_animation(
+                        sequence, durations, loop, output_path, codec,
+                        quality, content_type, lossless
+                    )
                 
-                return results
+                file_size = 0 if dry_run else get_file_size(output_path)
+                outputs[(format_name, width)] = {
+                    "path": str(output_path),
+                    "size": dimensions,
+                    "format": format_name,
+                    "file_size": file_size,
+                    "frames": output_frames,
+                    "bytes_saved": 0 if dry_run else original_size - file_size,
+                    **encoding
+                }
+                encoded[(dimensions, format_name)] = outputs[(format_name, width)]
+        
+        
+        animation = {
+            "source_frames": source_frames,
+            "output_frames": output_frames,
+            "merged_frames": source_frames - output_frames
+        }
+        return outputs, animation
+    
+    def _save_animation(self, frames, durations, loop, output_path, codec, quality_override,
+                        content_type, lossless=False):
+        """Encode resized animation frames with appropriate settings"""
+        if quality_override:
+            quality = quality_override
+        else:
+            quality = get_quality_settings(content_type, codec.name)
+        
+        save_kwargs = self._get_save_kwargs(codec, content_type)
+        lossless = lossless and codec.lossless_kwargs is not None
+        if lossless:
+            save_kwargs.update(codec.lossless_kwargs)
+        save_kwargs.update(codec.alpha_kwargs)
+        if codec.lossy:
+            save_kwargs["quality"] = quality
+        
+        self._clear_output(output_path)
+        frames[0].save(
+            output_path, format=codec.pil_format, save_all=True,
+            append_images=frames[1:], duration=durations, loop=loop,
+            **save_kwargs
+        )
+        logger.info(f"Saved {output_path} ({len(frames)} frames)")
+        
+        encoding = {"quality": quality}
+        if lossless:
+            encoding["lossless"] = True
+        return encoding
+    
+    def _alias_output(self, primary, image_path, width, dry_run, defer=None):
+        """
+        Satisfy a width whose dimensions were already encoded
+        
+        Depending on the layout the encoded file is hardlinked or symlinked
+        into the width's folder, or only referenced from the manifest. With
+        defer, the link is made through it after the encoded file is written.
+        
+        Returns:
+            Output information for the width, with alias_of naming the
+            encoded file
+        """
+        alias = {**primary, "alias_of": primary["path"]}
+        if self.layout == "manifest":
+            return alias
+        
+        output_path = self._create_output_path(
+            image_path, width, get_codec(primary["format"]).extension
+        )
+        alias["path"] = str(output_path)
+        if dry_run:
+            return alias
+        
+        if defer is not None:
+            defer(self._link_output, Path(primary["path"]), output_path)
+        else:
+            self._link_output(Path(primary["path"]), output_path)
+        return alias
+    
+    def _link_output(self, encoded_path, output_path):
+        """Link output_path to an encoded file according to the layout"""
+        self._clear_output(output_path)
+        if self.layout == "symlink":
+            output_path.symlink_to(os.path.relpath(encoded_path, output_path.parent))
+        else:
+            try:
+                os.link(encoded_path, output_path)
+            except OSError:
+                # Filesystems without hardlinks get a plain copy
+                shutil.copy2(encoded_path, output_path)
+        logger.info(f"Linked {output_path} -> {encoded_path}")
+    
+    def _clear_output(self, output_path):
+        """
+        Remove a file or link left at output_path by an earlier run
+        
+        Outputs may be hardlinks or symlinks to another width's file, so
+        writing in place would change that file too.
+        """
+        Path(output_path).unlink(missing_ok=True)
+    
+    def _write_output(self, output_path, data):
+        """Write encoded bytes to output_path, replacing any earlier file or link"""
+        self._clear_output(output_path)
+        output_path.write_bytes(data)
+    
+    def _write_manifest(self, image_path, outputs):
+        """
+        Write <stem>_sizes.json mapping each width and format to the file
+        that serves it, relative to the image's folder
+        
+        Returns:
+            Path of the manifest
+        """
+        manifest = {}
+        for (format_name, width), output in sorted(outputs.items(), key=lambda item: item[0][1]):
+            path = Path(output.get("alias_of", output["path"]))
+            manifest.setdefault(str(width), {})[format_name] = path.relative_to(image_path.parent).as_posix()
+        
+        manifest_path = image_path.parent / f"{image_path.stem}{MANIFEST_SUFFIX}"
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+        logger.info(f"Wrote manifest: {manifest_path}")
+        return str(manifest_path)
+    
+    def _prune_outputs(self, outputs, formats, output_sizes, image_path, original_size):
+        """
+        Delete outputs that are not smaller than prune_ratio times the best
+        more compatible alternative for the same width
+        
+        Formats are checked in order. The first is compared with the
+        original when both use the same codec; each later one with the
+        smallest output kept so far.
+        
+        Returns:
+            List of pruned outputs, each naming the fallback served instead
+        """
+        try:
+            original_codec = get_codec(image_path.suffix).name
+        except ValueError:
+            original_codec = None
+        
+        pruned = []
+        for width in output_sizes:
+            best = None
+            if original_codec == formats[0]:
+                best = {"path": str(image_path), "file_size": original_size}
+            
+            for format_name in formats:
+                output = outputs[(format_name, width)]
+                if best is None or output["file_size"] < self.prune_ratio * best["file_size"]:
+                    best = output
+                    continue
                 
-        except Exception as e:
-            logger.error(f"Error processing {image_path}: {str(e)}")
-            raise
+                del outputs[(format_name, width)]
+                Path(output["path"]).unlink(missing_ok=True)
+                pruned.append({**output, "fallback": best["path"]})
+                logger.info(
+                    f"Pruned {output['path']} ({format_file_size(output['file_size'])}), "
+                    f"serving {best['path']} ({format_file_size(best['file_size'])})"
+                )
+        
+        return pruned
     
     def _create_output_path(self, original_path, width, format_ext):
         """Create output path for resized image"""
@@ -148,110 +1113,403 @@ class ImageProcessor:
         
         return output_path
     
+    def _get_orientation(self, img):
+        """
+        Read the EXIF orientation tag
+        
+        Only the first IFD is parsed; the EXIF sub-IFDs, GPS data and maker
+        notes are never loaded. Returns 1 (normal) if the tag is missing or
+        the EXIF block cannot be read.
+        """
+        try:
+            return img.getexif().get(0x0112, 1)
+        except Exception as e:
+            logger.warning(f"Could not read EXIF orientation: {str(e)}")
+            return 1
+    
+    def _get_oriented_size(self, size, transform):
+        """Get the image size after the orientation transform is applied"""
+        width, height = size
+        if transform in SWAPPING_TRANSFORMS:
+            return height, width
+        return width, height
+    
+    def _apply_draft(self, img, output_sizes, transform):
+        """
+        Configure JPEG DCT scaling so the source decodes at a reduced size
+        
+        The decoder picks the largest 1/2, 1/4 or 1/8 scale that keeps the
+        image at least DRAFT_REDUCING_GAP times the largest output. Formats
+        other than JPEG ignore the request.
+        """
+        largest_width = max(width for width, height in output_sizes.values())
+        largest_height = max(height for width, height in output_sizes.values())
+        
+        # Draft sizes are in stored (unrotated) coordinates
+        largest_width, largest_height = self._get_oriented_size(
+            (largest_width, largest_height), transform
+        )
+        
+        requested = (
+            max(1, int(largest_width * DRAFT_REDUCING_GAP)),
+            max(1, int(largest_height * DRAFT_REDUCING_GAP))
+        )
+        original_size = img.size
+        if img.draft(None, requested) is not None and img.size != original_size:
+            logger.debug(f"Draft decoding {original_size} at {img.size}")
+    
     def _fix_image_orientation(self, img):
         """Fix image orientation based on EXIF data"""
-        try:
-            # Check if image has EXIF data
-            if hasattr(img, '_getexif') and img._getexif() is not None:
-                exif = img._getexif()
-                
-                # Get orientation tag (0x0112)
-                orientation = exif.get(0x0112, 1)
-                
-                # Apply rotation based on orientation
-                if orientation == 3:
-                    img = img.rotate(180, expand=True)
-                elif orientation == 6:
-                    img = img.rotate(270, expand=True)
-                elif orientation == 8:
-                    img = img.rotate(90, expand=True)
-                elif orientation in [2, 4, 5, 7]:
-                    # Handle mirrored orientations
-                    if orientation == 2:
-                        img = ImageOps.mirror(img)
-                    elif orientation == 4:
-                        img = img.rotate(180, expand=True)
-                        img = ImageOps.mirror(img)
-                    elif orientation == 5:
-                        img = img.rotate(90, expand=True)
-                        img = ImageOps.mirror(img)
-                    elif orientation == 7:
-                        img = img.rotate(270, expand=True)
-                        img = ImageOps.mirror(img)
-                
-                logger.debug(f"Applied EXIF orientation correction: {orientation}")
+        transform = ORIENTATION_TRANSFORMS.get(self._get_orientation(img))
+        if transform is None:
+            return img
+        
+        logger.debug(f"Applied EXIF orientation correction: {transform.name}")
+        return img.transpose(transform)
+    
+    def _resize_frames(self, img, output_sizes, dry_run=False, transform=None):
+        """
+        Yield (width, frame, resampling) tuples, resizing each frame only once
+        
+        Frames are resized in the stored orientation of the source and then
+        given the lossless orientation transform, so the transform always
+        runs on the smallest possible buffer.
+        
+        In direct mode every frame is resized from the source. In cascade
+        mode the largest frame is resized from the source, which is then
+        closed, and every smaller frame is resized from the previous one.
+        Widths that share dimensions share the same frame. In dry-run mode
+        no pixels are touched and the frame and resampling path are None.
+        """
+        if dry_run:
+            for width in output_sizes:
+                yield width, None, None
+            return
+        
+        if self.resize_mode == "cascade":
+            ordered = sorted(
+                output_sizes.items(), 
+                key=lambda item: item[1][0] * item[1][1], 
+                reverse=True
+            )
+        else:
+            ordered = list(output_sizes.items())
+        
+        previous = None
+        oriented = None
+        resampling = None
+        for width, dimensions in ordered:
+            # Output dimensions are oriented, resizing happens before the transform
+            dimensions = self._get_oriented_size(dimensions, transform)
             
-        except Exception as e:
-            logger.warning(f"Could not process EXIF orientation: {str(e)}")
+            if previous is not None and previous.size == dimensions:
+                yield width, oriented, resampling
+                continue
+            
+            if self.resize_mode == "cascade" and previous is not None:
+                frame, resampling = self._resize(previous, dimensions)
+            else:
+                # resize() always returns a copy, so the source can be closed
+                frame, resampling = self._resize(img, dimensions)
+                if self.resize_mode == "cascade":
+                    # The full-resolution buffer is no longer needed
+                    img.close()
+            
+            previous = frame
+            oriented = frame.transpose(transform) if transform is not None else frame
+            yield width, oriented, resampling
+    
+    def _resize(self, img, dimensions):
+        """
+        Resize an image with the configured resampling preset
         
-        return img
+        Returns:
+            Tuple of (resized image, description of the resampling path)
+        """
+        reducing_gap = RESAMPLING_PRESETS[self.resampling]
+        
+        if img.mode in ["1", "P"]:
+            # Pillow always uses nearest neighbour for these modes
+            path = "nearest"
+        elif reducing_gap is not None and img.mode not in ["LA", "RGBA"]:
+            # Same factors Pillow computes for the box pre-reduction
+            factor_x = int(img.width / dimensions[0] / reducing_gap) or 1
+            factor_y = int(img.height / dimensions[1] / reducing_gap) or 1
+            if factor_x > 1 or factor_y > 1:
+                path = f"reduce {factor_x}x{factor_y} + lanczos"
+            else:
+                path = "lanczos"
+        else:
+            path = "lanczos"
+        
+        if self._uses_tiles(img):
+            resized = self._resize_tiled(img, dimensions, reducing_gap)
+            path += f" in {self.tile_workers} strips"
+        else:
+            resized = img.resize(
+                dimensions, Image.Resampling.LANCZOS, reducing_gap=reducing_gap
+            )
+        return resized, path
+    
+    def _uses_tiles(self, img):
+        """Check whether a source is large enough for _resize_tiled"""
+        return (bool(self.tile_min_pixels) and self.tile_workers > 1
+                and img.width * img.height >= self.tile_min_pixels
+                and img.mode in TILE_MODES)
+    
+    def _resize_tiled(self, img, dimensions, reducing_gap=None):
+        """
+        Resize in horizontal strips on the tile pool and stitch the result
+        
+        Each output strip reads the source rows it maps to plus enough
+        overlap for the LANCZOS kernel, and is resized with a source box so
+        it uses the same sampling grid as a single resize call. The box
+        pre-reduction Pillow would apply is done per strip on rows aligned
+        to the reduction factor, so its blocks match too.
+        """
+        width, height = dimensions
+        scale = img.height / height
+        
+        # Same factors Pillow computes; it skips the pre-reduction for
+        # modes with alpha
+        factor_x = factor_y = 1
+        if reducing_gap is not None and img.mode not in ["LA", "RGBA"]:
+            factor_x = int(img.width / width / reducing_gap) or 1
+            factor_y = int(img.height / height / reducing_gap) or 1
+        margin = math.ceil(LANCZOS_SUPPORT * max(scale, 1.0)) + factor_y + 1
+        
+        def resize_strip(top_row, bottom_row):
+            top = max(0, math.floor(top_row * scale) - margin)
+            top -= top % factor_y
+            bottom = min(img.height, math.ceil(bottom_row * scale) + margin)
+            region = img.crop((0, top, img.width, bottom))
+            box = (0, top_row * scale - top, img.width, bottom_row * scale - top)
+            if factor_x > 1 or factor_y > 1:
+                region = region.reduce((factor_x, factor_y))
+                box = (0, box[1] / factor_y, box[2] / factor_x, box[3] / factor_y)
+            return region.resize((width, bottom_row - top_row), Image.Resampling.LANCZOS, box=box)
+        
+        # Crops from several threads must not trigger a lazy load
+        img.load()
+        with self._stats_lock:
+            if self._tile_pool is None:
+                self._tile_pool = ThreadPoolExecutor(
+                    max_workers=self.tile_workers, thread_name_prefix="tile"
+                )
+        
+        strips = min(self.tile_workers, height)
+        bounds = [round(index * height / strips) for index in range(strips + 1)]
+        futures = [
+            (top_row, self._tile_pool.submit(resize_strip, top_row, bottom_row))
+            for top_row, bottom_row in zip(bounds, bounds[1:])
+        ]
+        
+        resized = Image.new(img.mode, dimensions)
+        for top_row, future in futures:
+            resized.paste(future.result(), (0, top_row))
+        return resized
     
-    def _save_resized_image(self, img, dimensions, output_path, format_ext, quality_override, content_type):
-        """Save resized image with appropriate settings"""
-        # Handle EXIF orientation to preserve rotation
-        img = self._fix_image_orientation(img)
+    def _save_image(self, img, output_path, format_name, quality_override, content_type,
+                    target_ssim=None, max_bytes=None, lossless=False, keep_palette=False):
+        """
+        Encode an already resized frame with appropriate settings
         
-        # Resize image
-        resized_img = img.resize(dimensions, Image.Resampling.LANCZOS)
+        With target_ssim or max_bytes, lossy formats get their quality from
+        a bounded search (see _search_quality) instead of the static table.
+        lossless selects lossless encoding where the codec supports it, and
+        keep_palette quantizes output back to a palette where possible.
+        
+        Returns:
+            Dictionary describing the encoding (quality, and search results)
+        """
+        codec = get_codec(format_name)
         
         # Determine quality
         if quality_override:
             quality = quality_override
         else:
-            quality = get_quality_settings(content_type, format_ext)
+            quality = get_quality_settings(content_type, codec.name)
         
-        # Save with appropriate settings
-        save_kwargs = {"optimize": True}
+        save_kwargs = self._get_save_kwargs(codec, content_type)
+        img = self._prepare_for_format(img, codec, keep_palette)
         
-        if format_ext.lower() in ["jpeg", "jpg"]:
-            save_kwargs.update({"quality": quality, "progressive": True})
-        elif format_ext.lower() == "png":
-            save_kwargs.update({"compress_level": 6})
-        elif format_ext.lower() == "webp":
-            save_kwargs.update({"quality": quality, "method": 6})
+        lossless = lossless and codec.lossless_kwargs is not None
+        lossy = codec.lossy and not lossless
+        if lossless:
+            # For lossless encoding the quality sets compression effort
+            save_kwargs.update(codec.lossless_kwargs)
+        if "A" in img.getbands():
+            save_kwargs.update(codec.alpha_kwargs)
         
-        # Ensure format is correct for PIL
-        pil_format = "JPEG" if format_ext.lower() in ["jpeg", "jpg"] else format_ext.upper()
+        if (target_ssim is not None or max_bytes is not None) and lossy:
+            data, encoding = self._search_quality(
+                img, codec.pil_format, save_kwargs, target_ssim, max_bytes
+            )
+            # Only the winning trial is written
+            if hasattr(output_path, "write"):
+                output_path.write(data)
+            else:
+                with open(output_path, "wb") as f:
+                    f.write(data)
+        else:
+            if codec.lossy:
+                save_kwargs["quality"] = quality
+            img.save(output_path, format=codec.pil_format, **save_kwargs)
+            encoding = {"quality": quality}
         
-        # For JPEG, strip EXIF data to avoid orientation conflicts
-        # The orientation has already been applied to the image pixels
-        if pil_format == "JPEG":
-            save_kwargs["exif"] = b""  # Strip EXIF data
+        if lossless:
+            encoding["lossless"] = True
         
-        resized_img.save(output_path, format=pil_format, **save_kwargs)
         logger.info(f"Saved {output_path}")
+        return encoding
+    
+    def _prepare_for_format(self, img, codec, keep_palette=False):
+        """Convert a frame to a mode the output codec can store"""
+        if not codec.supports_alpha and ("A" in img.getbands() or img.mode == "P"):
+            # No alpha channel in this format, flatten onto a white background
+            rgba = img.convert("RGBA")
+            flattened = Image.new("RGB", img.size, "white")
+            flattened.paste(rgba, mask=rgba.getchannel("A"))
+            return flattened
+        
+        if codec.pil_format == "JPEG" and img.mode not in ["RGB", "L", "CMYK"]:
+            return img.convert("RGB")
+        
+        if codec.supports_palette and keep_palette and img.mode != "P":
+            return img.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+        
+        return img
+    
+    def _get_save_kwargs(self, codec, content_type):
+        """Get save options for a codec from the encoder profile, without quality"""
+        profile = ENCODER_PROFILES[self.encoder_profile]
+        save_kwargs = {**codec.save_kwargs, **profile.get(codec.name, {})}
+        
+        if codec.subsampling is not None:
+            code = profile["subsampling"].get(content_type, 2)
+            save_kwargs["subsampling"] = codec.subsampling[code]
+        
+        return save_kwargs
+    
+    def _search_quality(self, img, pil_format, save_kwargs, target_ssim=None, max_bytes=None):
+        """
+        Binary search the encoder quality for a target
+        
+        With target_ssim, find the lowest quality whose SSIM against img is
+        at least target_ssim. With max_bytes, find the highest quality whose
+        output fits in max_bytes. Trial encodes stay in memory. If no trial
+        meets the target, the trial closest to it (highest quality for SSIM,
+        lowest for bytes) is used.
+        
+        Returns:
+            Tuple of (encoded bytes, encoding details dictionary)
+        """
+        low, high = QUALITY_SEARCH_RANGE
+        best = None
+        fallback = None
+        trials = 0
+        
+        while low <= high and trials < QUALITY_SEARCH_MAX_TRIALS:
+            quality = (low + high) // 2
+            buffer = io.BytesIO()
+            img.save(buffer, format=pil_format, quality=quality, **save_kwargs)
+            data = buffer.getvalue()
+            trials += 1
+            
+            if target_ssim is not None:
+                with Image.open(io.BytesIO(data)) as decoded:
+                    score = calculate_ssim(img, decoded)
+                candidate = (data, {"quality": quality, "ssim": round(score, 4)})
+                met = score >= target_ssim
+                if fallback is None or quality > fallback[1]["quality"]:
+                    fallback = candidate
+            else:
+                candidate = (data, {"quality": quality})
+                met = len(data) <= max_bytes
+                if fallback is None or quality < fallback[1]["quality"]:
+                    fallback = candidate
+            
+            if met:
+                best = candidate
+            # Lower quality while the SSIM target is met, raise it while
+            # the byte budget is met
+            if met == (target_ssim is not None):
+                high = quality - 1
+            else:
+                low = quality + 1
+        
+        data, encoding = best or fallback
+        encoding.update({"search_trials": trials, "target_met": best is not None})
+        return data, encoding
+    
+    def __getstate__(self):
+        """Drop the stats lock and worker pools when a processor is sent to a worker process"""
+        state = self.__dict__.copy()
+        del state["_stats_lock"]
+        state["_encode_pool"] = None
+        state["_tile_pool"] = None
+        state["_shared_pool"] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._stats_lock = threading.Lock()
     
     def _update_stats(self, results):
         """Update processing statistics"""
-        self.stats["processed"] += 1
-        self.stats["original_size"] += results["original_size"]
+        stats = {
+            "processed": 1,
+            "original_size": results["original_size"],
+            "optimized_size": 0,
+            "files_created": 0
+        }
         
         for output in results["outputs"]:
-            self.stats["optimized_size"] += output["file_size"]
-            self.stats["files_created"] += 1
+            # Links to an encoded file add no new bytes
+            if "alias_of" in output:
+                continue
+            stats["optimized_size"] += output["file_size"]
+            stats["files_created"] += 1
+        
+        self.merge_stats(stats)
+    
+    def merge_stats(self, stats):
+        """
+        Add counters from another run, such as a worker process, to this
+        processor's statistics
+        
+        Safe to call from several threads.
+        """
+        with self._stats_lock:
+            for key, value in stats.items():
+                self.stats[key] = self.stats.get(key, 0) + value
     
     def get_stats(self):
         """Get processing statistics"""
-        if self.stats["original_size"] > 0:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        
+        if stats["original_size"] > 0:
             reduction = calculate_size_reduction(
-                self.stats["original_size"], 
-                self.stats["optimized_size"]
+                stats["original_size"], 
+                stats["optimized_size"]
             )
         else:
             reduction = 0
         
         return {
-            **self.stats,
+            **stats,
             "size_reduction_percent": reduction,
-            "original_size_formatted": format_file_size(self.stats["original_size"]),
-            "optimized_size_formatted": format_file_size(self.stats["optimized_size"])
+            "original_size_formatted": format_file_size(stats["original_size"]),
+            "optimized_size_formatted": format_file_size(stats["optimized_size"])
         }
     
     def reset_stats(self):
         """Reset processing statistics"""
-        self.stats = {
-            "processed": 0,
-            "original_size": 0,
-            "optimized_size": 0,
-            "files_created": 0
-        }
\ No newline at end of file
+        with self._stats_lock:
+            self.stats = {
+                "processed": 0,
+                "original_size": 0,
+                "optimized_size": 0,
+                "files_created": 0
+            }
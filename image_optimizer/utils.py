@@ -3,11 +3,29 @@ Utility functions for image processing
 """
 
 import os
+import re
+import json
+import logging
+import threading
+from collections import OrderedDict
+from fnmatch import fnmatch
+from functools import lru_cache
 from pathlib import Path
 from PIL import Image
 import numpy as np
 
-from .config import SUPPORTED_FORMATS, QUALITY_SETTINGS
+from .config import (
+    SUPPORTED_FORMATS,
+    QUALITY_SETTINGS,
+    OUTPUT_FORMAT_RULES,
+    FOLDER_CONFIG_FILE,
+    BACKUP_FOLDER,
+    CONTENT_TYPE_CACHE_SIZE
+)
+from .classifier import classify_image
+from .codecs import get_codec
+
+logger = logging.getLogger(__name__)
 
 
 def is_image_file(file_path):
@@ -15,47 +33,263 @@ def is_image_file(file_path):
     return Path(file_path).suffix.lower() in SUPPORTED_FORMATS["input"]
 
 
-def detect_content_type(image_path):
+# Output folders are named <stem>_<width>px (see ImageProcessor._create_output_path)
+_OUTPUT_FOLDER = re.compile(r"^(?P<stem>.+)_\d+px$")
+
+
+def is_output_path(file_path):
+    """Check if a path looks like a file the optimizer wrote (<stem>_<width>px/<stem>.<ext>)"""
+    file_path = Path(file_path)
+    output = _OUTPUT_FOLDER.match(file_path.parent.name)
+    return output is not None and output.group("stem") == file_path.stem
+
+
+def iter_image_files(folder_path, recursive=True, ignore=None, backup_folder=BACKUP_FOLDER):
+    """
+    Walk a folder with os.scandir, yielding image files as they are found
+    
+    Each directory's entries are visited in name order, files before
+    subfolders. The walk does not descend into the optimizer's own output
+    folders (<stem>_<width>px next to an image with that stem), the backup
+    folder, or symlinked folders, so generated files are never treated as
+    sources.
+    
+    Args:
+        folder_path: Folder to walk
+        recursive: Whether to walk subfolders
+        ignore: Glob patterns; files and folders whose name or path
+            relative to folder_path matches one are skipped
+        backup_folder: Backup folder to skip, matched by name and location
+    
+    Yields:
+        Path of each supported image file
+    """
+    root = Path(folder_path)
+    ignore = list(ignore or [])
+    backup_folder = Path(backup_folder)
+    backup_location = os.path.abspath(backup_folder)
+    
+    def ignored(name, relative):
+        return any(fnmatch(name, pattern) or fnmatch(relative, pattern) for pattern in ignore)
+    
+    pending = [(root, "")]
+    while pending:
+        folder, prefix = pending.pop()
+        try:
+            with os.scandir(folder) as scan:
+                entries = sorted(scan, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Cannot read folder {folder}: {str(e)}")
+            continue
+        
+        folders = []
+        stems = set()
+        for entry in entries:
+            relative = prefix + entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append((entry, relative))
+                    continue
+                if not entry.is_file() or not is_image_file(entry.name):
+                    continue
+            except OSError:
+                continue
+            stems.add(Path(entry.name).stem)
+            if not ignored(entry.name, relative):
+                yield Path(entry.path)
+        
+        if not recursive:
+            continue
+        subfolders = []
+        for entry, relative in folders:
+            output = _OUTPUT_FOLDER.match(entry.name)
+            if output and output.group("stem") in stems:
+                continue
+            if entry.name == backup_folder.name or os.path.abspath(entry.path) == backup_location:
+                continue
+            if ignored(entry.name, relative):
+                continue
+            subfolders.append((Path(entry.path), relative + "/"))
+        # Reversed so the stack pops them in name order
+        pending.extend(reversed(subfolders))
+
+
+def iter_path_list(stream, null_separated=False, chunk_size=65536):
+    """
+    Read file paths from a binary stream as they arrive
+    
+    Entries are separated by newlines (a trailing carriage return is
+    dropped), or by NUL bytes for find -print0 style input. Empty entries
+    are skipped. Names are decoded with the file system encoding.
+    
+    Yields:
+        Path of each entry
+    """
+    separator = b"\0" if null_separated else b"\n"
+    # read1 returns what a pipe has so far instead of waiting for a full chunk
+    read = getattr(stream, "read1", stream.read)
+    buffer = b""
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        *entries, buffer = buffer.split(separator)
+        for entry in entries:
+            if not null_separated:
+                entry = entry.rstrip(b"\r")
+            if entry:
+                yield Path(os.fsdecode(entry))
+    if not null_separated:
+        buffer = buffer.rstrip(b"\r")
+    if buffer:
+        yield Path(os.fsdecode(buffer))
+
+
+# Detected content types keyed by ((path, size, mtime), ignore_alpha), in
+# least recently used order. lru_cache does not fit here because the open
+# image passed to detect_content_type must not become part of the key.
+_content_type_cache = OrderedDict()
+_content_type_lock = threading.Lock()
+
+
+def detect_content_type(image_path, img=None, ignore_alpha=False):
     """
     Detect image content type: photo, screenshot, or graphic
     Based on image characteristics and file properties
+    
+    If the image is already open it can be passed as img so the file is
+    not opened twice. Features are computed on a fixed-size sample (see
+    classifier.py), so the cost does not grow with the image size. Results
+    are cached by path, size and modification time, for at most
+    CONTENT_TYPE_CACHE_SIZE files.
+    
+    Images with transparency are reported as graphics unless ignore_alpha
+    is set, which classifies them by their visible pixels alone.
     """
+    identity = _get_file_identity(image_path)
+    cache_key = (identity, ignore_alpha)
+    with _content_type_lock:
+        if cache_key in _content_type_cache:
+            _content_type_cache.move_to_end(cache_key)
+            return _content_type_cache[cache_key]
+    
     try:
-        with Image.open(image_path) as img:
-            # Get image properties
-            width, height = img.size
-            mode = img.mode
-            format_name = img.format.lower() if img.format else ""
-            
-            # Convert to numpy array for analysis
-            img_array = np.array(img)
-            
-            # Simple heuristic for content detection
-            if format_name == "jpeg":
-                # JPEG files are typically photos
-                return "photo"
-            elif format_name == "png":
-                # PNG could be screenshot or graphic
-                # Check for transparency (common in screenshots/graphics)
-                if mode == "RGBA" and np.any(img_array[:, :, 3] < 255):
-                    return "graphic"
-                
-                # Check for high contrast (common in screenshots)
-                if len(img_array.shape) == 3:
-                    # Calculate contrast
-                    std_dev = np.std(img_array)
-                    if std_dev > 50:  # High contrast suggests screenshot
-                        return "screenshot"
-                
-                return "graphic"
-            elif format_name == "gif":
-                return "graphic"
-            else:
-                # Default to photo for unknown formats
-                return "photo"
+        if img is None:
+            with Image.open(image_path) as opened:
+                content_type = _detect_image_content_type(opened, ignore_alpha)
+        else:
+            content_type = _detect_image_content_type(img, ignore_alpha)
     except Exception:
         # Default to photo if detection fails
         return "photo"
+    
+    if identity is not None:
+        with _content_type_lock:
+            _content_type_cache[cache_key] = content_type
+            _content_type_cache.move_to_end(cache_key)
+            while len(_content_type_cache) > CONTENT_TYPE_CACHE_SIZE:
+                _content_type_cache.popitem(last=False)
+    return content_type
+
+
+def clear_content_type_cache():
+    """Forget all cached content type detections"""
+    with _content_type_lock:
+        _content_type_cache.clear()
+
+
+def _get_file_identity(file_path):
+    """Get a (path, size, mtime) tuple identifying a file's contents"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+def _detect_image_content_type(img, ignore_alpha=False):
+    """Detect content type of an open image"""
+    return classify_image(img, ignore_alpha)
+
+
+def get_image_kind(img):
+    """
+    Classify an image by mode: palette, alpha, or opaque
+    
+    Images with an alpha band only count as alpha if at least one pixel
+    is not fully opaque.
+    """
+    if img.mode == "P":
+        return "palette"
+    
+    bands = img.getbands()
+    if "A" in bands:
+        alpha_min, alpha_max = img.getextrema()[bands.index("A")]
+        if alpha_min < 255:
+            return "alpha"
+    
+    return "opaque"
+
+
+def select_output_formats(image_kind, allowed_extensions=None):
+    """
+    Select output formats for an image kind
+    
+    Args:
+        image_kind: Result of get_image_kind()
+        allowed_extensions: Output extensions or codec names to choose
+            from (defaults to SUPPORTED_FORMATS["output"])
+    
+    Returns:
+        List of output format names, in output order
+    """
+    allowed = set()
+    for name in allowed_extensions or SUPPORTED_FORMATS["output"]:
+        try:
+            codec = get_codec(name)
+        except ValueError:
+            logger.warning(f"Ignoring unknown output format: {name}")
+            continue
+        if not codec.available:
+            logger.warning(f"Skipping {codec.name}: not supported by this Pillow build")
+            continue
+        allowed.add(codec.name)
+    
+    formats = [name for name in OUTPUT_FORMAT_RULES[image_kind] if name in allowed]
+    
+    if not formats:
+        # Nothing preferred is allowed, fall back to the allowed formats
+        formats = sorted(allowed)
+    
+    return formats
+
+
+def get_folder_output_formats(folder):
+    """Get allowed output extensions, honouring per-folder settings files"""
+    return _load_folder_output_formats(str(Path(folder).resolve()))
+
+
+@lru_cache(maxsize=256)
+def _load_folder_output_formats(folder):
+    """Find the nearest folder settings file that sets output formats"""
+    folder = Path(folder)
+    for directory in [folder, *folder.parents]:
+        config_path = directory / FOLDER_CONFIG_FILE
+        if not config_path.is_file():
+            continue
+        
+        try:
+            with open(config_path) as f:
+                settings = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring invalid {config_path}: {str(e)}")
+            continue
+        
+        if "output" in settings:
+            return list(settings["output"])
+    
+    return list(SUPPORTED_FORMATS["output"])
 
 
 def calculate_output_sizes(original_size, target_sizes):
@@ -110,8 +344,86 @@ def get_file_size(file_path):
     return os.path.getsize(file_path)
 
 
+# Bytes per band for modes wider than 8 bits
+_BAND_BYTES = {"I": 4, "F": 4, "I;16": 2, "I;16B": 2, "I;16L": 2, "I;16N": 2}
+
+
+def probe_image(image_path):
+    """
+    Read an image's header without decoding its pixels
+    
+    Returns:
+        Dict with width, height, bands (bytes per pixel when decoded),
+        file_size and mtime. Width and height are 0 if the header cannot
+        be read; file_size and mtime are 0 if the file cannot be stat'd.
+    """
+    probe = {"width": 0, "height": 0, "bands": 0, "file_size": 0, "mtime": 0}
+    try:
+        stat = os.stat(image_path)
+        probe["file_size"] = stat.st_size
+        probe["mtime"] = stat.st_mtime
+        with Image.open(image_path) as img:
+            probe["width"], probe["height"] = img.size
+            probe["bands"] = len(img.getbands()) * _BAND_BYTES.get(img.mode, 1)
+    except Exception:
+        pass
+    return probe
+
+
+def estimate_decoded_bytes(image_path):
+    """
+    Estimate the memory a decoded image needs from its header alone
+    
+    Returns width x height x bands (times the bytes per band for 16- and
+    32-bit modes), or 0 if the header cannot be read so the file is still
+    processed and fails with its real error.
+    """
+    probe = probe_image(image_path)
+    return probe["width"] * probe["height"] * probe["bands"]
+
+
 def calculate_size_reduction(original_size, optimized_size):
     """Calculate percentage size reduction"""
     if original_size == 0:
         return 0
-    return ((original_size - optimized_size) / original_size) * 100
\ No newline at end of file
+    return ((original_size - optimized_size) / original_size) * 100
+
+
+def calculate_ssim(reference, candidate, block_size=8):
+    """
+    Calculate the mean structural similarity (SSIM) of two images
+    
+    Computed on luminance over non-overlapping block_size windows, fully
+    vectorized with NumPy. Both images must have the same dimensions.
+    Returns a value up to 1.0 for identical images.
+    """
+    a = np.asarray(reference.convert("L"), dtype=np.float64)
+    b = np.asarray(candidate.convert("L"), dtype=np.float64)
+    if a.shape != b.shape:
+        raise ValueError(f"Image sizes differ: {reference.size} and {candidate.size}")
+    
+    # Crop to whole blocks; tiny images are treated as a single block
+    height, width = a.shape
+    if height >= block_size and width >= block_size:
+        height -= height % block_size
+        width -= width % block_size
+        shape = (height // block_size, block_size, width // block_size, block_size)
+    else:
+        shape = (1, height, 1, width)
+    a = a[:height, :width].reshape(shape)
+    b = b[:height, :width].reshape(shape)
+    
+    mean_a = a.mean(axis=(1, 3), keepdims=True)
+    mean_b = b.mean(axis=(1, 3), keepdims=True)
+    var_a = ((a - mean_a) ** 2).mean(axis=(1, 3))
+    var_b = ((b - mean_b) ** 2).mean(axis=(1, 3))
+    covariance = ((a - mean_a) * (b - mean_b)).mean(axis=(1, 3))
+    mean_a = mean_a[:, 0, :, 0]
+    mean_b = mean_b[:, 0, :, 0]
+    
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    ssim = ((2 * mean_a * mean_b + c1) * (2 * covariance + c2)) / (
+        (mean_a ** 2 + mean_b ** 2 + c1) * (var_a + var_b + c2)
+    )
+    return float(ssim.mean())
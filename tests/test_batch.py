@@ -3,9 +3,14 @@ Unit tests for batch processor
 """
 
 import unittest
+import asyncio
+import threading
+import time
 import tempfile
 import shutil
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 from PIL import Image
 import numpy as np
 
@@ -140,6 +145,287 @@ class TestBatchProcessor(unittest.TestCase):
         self.assertEqual(summary["errors"], 0)
         self.assertEqual(summary["total_files"], 3)
     
+    def test_recompress_folder(self):
+        """Test recompressing every original in a folder"""
+        results = self.batch_processor.recompress_folder(self.test_folder, dry_run=True)
+        
+        self.assertEqual(len(results), 5)
+        pngs = [r for r in results if r["original_path"].endswith(".png")]
+        self.assertEqual(len(pngs), 2)
+        for result in pngs:
+            self.assertNotIn("skipped", result)
+            self.assertFalse(result["replaced"])
+    
+    def test_process_folder_process_executor(self):
+        """Test the process pool merges worker stats into the parent"""
+        processor = BatchProcessor(
+            max_workers=2, executor="process", backup=False, prune=False
+        )
+        
+        results = processor.process_folder(self.test_folder, sizes=[200], dry_run=False)
+        
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all("error" not in r for r in results))
+        stats = processor.get_summary()["stats"]
+        self.assertEqual(stats["processed"], 5)
+        self.assertEqual(stats["files_created"], sum(len(r["outputs"]) for r in results))
+        self.assertEqual(stats["original_size"], sum(r["original_size"] for r in results))
+    
+    def test_thread_executor_stats_are_consistent(self):
+        """Test concurrent stat updates from threads are not lost"""
+        processor = self.batch_processor.processor
+        results = {"original_size": 1, "outputs": [{"file_size": 1}]}
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(2000):
+                executor.submit(processor._update_stats, results)
+        
+        self.assertEqual(processor.get_stats()["processed"], 2000)
+        self.assertEqual(processor.get_stats()["files_created"], 2000)
+    
+    def test_pipeline_engine_matches_pool(self):
+        """Test the staged pipeline writes the same files as the pool engine"""
+        pool_folder = Path(self.temp_dir) / "pool"
+        pipeline_folder = Path(self.temp_dir) / "pipeline"
+        shutil.copytree(self.test_folder, pool_folder)
+        shutil.copytree(self.test_folder, pipeline_folder)
+        
+        pool = BatchProcessor(max_workers=2, backup=False, prune=False)
+        pool_results = pool.process_folder(pool_folder, sizes=[200, 400])
+        pipeline = BatchProcessor(
+            engine="pipeline", stage_workers={"encode": 2}, backup=True,
+            backup_folder=self.backup_dir, prune=False
+        )
+        pipeline_results = pipeline.process_folder(pipeline_folder, sizes=[200, 400])
+        
+        self.assertEqual(len(pipeline_results), 5)
+        by_name = {Path(r["original_path"]).name: r for r in pool_results}
+        for result in pipeline_results:
+            self.assertNotIn("error", result)
+            self.assertTrue(result["backup_created"])
+            expected = by_name[Path(result["original_path"]).name]
+            self.assertEqual(len(result["outputs"]), len(expected["outputs"]))
+            for output, other in zip(result["outputs"], expected["outputs"]):
+                self.assertEqual(output["file_size"], Path(output["path"]).stat().st_size)
+                self.assertEqual(Path(output["path"]).read_bytes(), Path(other["path"]).read_bytes())
+        
+        self.assertEqual(pipeline.get_summary()["stats"]["processed"], 5)
+        stages = pipeline.pipeline_stats
+        self.assertEqual(list(stages), ["read", "decode", "resize", "encode", "write"])
+        self.assertEqual(stages["encode"]["workers"], 2)
+        self.assertEqual(stages["decode"]["items"], 5)
+        for info in stages.values():
+            self.assertGreaterEqual(info["utilisation"], 0.0)
+            self.assertLessEqual(info["utilisation"], 1.0)
+    
+    def test_pipeline_rerun_replaces_linked_outputs(self):
+        """Test the pipeline writer replaces links left by an earlier run"""
+        folder = Path(self.temp_dir) / "rerun"
+        folder.mkdir()
+        image_path = folder / "hero.jpg"
+        Image.new("RGB", (300, 200), "white").save(image_path, "JPEG")
+        processor = BatchProcessor(engine="pipeline", backup=False, prune=False)
+        processor.process_folder(folder, sizes=[200, 400, 800])
+        
+        Image.new("RGB", (1200, 800), "white").save(image_path, "JPEG")
+        results = processor.process_folder(folder, sizes=[200, 400, 800])
+        
+        for output in results[0]["outputs"]:
+            with Image.open(output["path"]) as img:
+                self.assertEqual(img.size, output["size"])
+    
+    def test_pipeline_engine_reports_errors(self):
+        """Test a file failing in one stage does not stop the others"""
+        (self.test_folder / "broken.jpg").write_bytes(b"not an image")
+        processor = BatchProcessor(engine="pipeline", backup=False)
+        
+        results = processor.process_folder(self.test_folder, sizes=[100], dry_run=True)
+        
+        self.assertEqual(len(results), 6)
+        errors = [r for r in results if "error" in r]
+        self.assertEqual([Path(r["original_path"]).name for r in errors], ["broken.jpg"])
+    
+    def test_pipeline_engine_rejects_process_executor(self):
+        """Test the thread-based pipeline cannot be combined with processes"""
+        with self.assertRaises(ValueError):
+            BatchProcessor(engine="pipeline", executor="process")
+    
+    def test_process_folder_async(self):
+        """Test the async iterator yields every result within the concurrency limit"""
+        processor = self.batch_processor.processor
+        original = processor.process_image
+        lock = threading.Lock()
+        active = [0, 0]
+        
+        def tracked(*args, **kwargs):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            try:
+                time.sleep(0.05)
+                return original(*args, **kwargs)
+            finally:
+                with lock:
+                    active[0] -= 1
+        
+        async def collect():
+            return [r async for r in self.batch_processor.process_folder_async(
+                self.test_folder, concurrency=2, sizes=[100], dry_run=True
+            )]
+        
+        with patch.object(processor, "process_image", side_effect=tracked):
+            results = asyncio.run(collect())
+        
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all("error" not in r for r in results))
+        self.assertLessEqual(active[1], 2)
+    
+    def test_process_folder_async_stop_early(self):
+        """Test leaving the iterator early cancels the images in flight"""
+        async def first():
+            results = self.batch_processor.process_folder_async(
+                self.test_folder, concurrency=2, sizes=[100], dry_run=True
+            )
+            async for result in results:
+                await results.aclose()
+                return result
+        
+        result = asyncio.run(first())
+        
+        self.assertIn("outputs", result)
+        self.assertEqual(len(self.batch_processor.results), 1)
+    
+    def test_process_workers_split_encode_threads(self):
+        """Test worker processes share the cores instead of each using all of them"""
+        with patch("image_optimizer.batch.os.cpu_count", return_value=8):
+            processor = BatchProcessor(max_workers=4, executor="process")
+            explicit = BatchProcessor(max_workers=4, executor="process", encode_workers=3)
+        
+        self.assertEqual(processor.worker_kwargs["encode_workers"], 2)
+        self.assertEqual(explicit.worker_kwargs["encode_workers"], 3)
+        for name in ["tile_workers", "shared_workers"]:
+            self.assertEqual(processor.worker_kwargs[name], 2)
+            self.assertEqual(explicit.worker_kwargs[name], 2)
+        self.assertNotIn("tile_workers", processor.processor_kwargs)
+    
+    def _track_concurrency(self, batch_processor):
+        """Patch process_image to record the most images processed at once"""
+        lock = threading.Lock()
+        active = [0, 0]
+        original = batch_processor.processor.process_image
+        
+        def tracked(*args, **kwargs):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            try:
+                time.sleep(0.05)
+                return original(*args, **kwargs)
+            finally:
+                with lock:
+                    active[0] -= 1
+        
+        return patch.object(batch_processor.processor, "process_image", side_effect=tracked), active
+    
+    def test_memory_budget_limits_images_in_flight(self):
+        """Test images only start while their decoded estimates fit the budget"""
+        # PNGs estimate 400x600x3 = 720,000 bytes, JPEGs 600x800x3 = 1,440,000
+        budget = 1_500_000
+        batch_processor = BatchProcessor(max_workers=4, backup=False, memory_budget=budget)
+        patcher, active = self._track_concurrency(batch_processor)
+        
+        with patcher:
+            results = batch_processor.process_folder(self.test_folder, sizes=[100], dry_run=True)
+        
+        self.assertEqual(len(results), 5)
+        self.assertFalse(any("error" in r for r in results))
+        self.assertEqual(active[1], 2)
+        self.assertLessEqual(batch_processor.memory_peak, budget)
+    
+    def test_memory_budget_runs_oversized_images_alone(self):
+        """Test images larger than the whole budget still run, one at a time"""
+        for engine in ["pool", "pipeline"]:
+            batch_processor = BatchProcessor(max_workers=4, engine=engine, backup=False, memory_budget=1000)
+            patcher, active = self._track_concurrency(batch_processor)
+            
+            with patcher:
+                results = batch_processor.process_folder(self.test_folder, sizes=[100], dry_run=True)
+            
+            self.assertEqual(len(results), 5)
+            self.assertFalse(any("error" in r for r in results))
+            self.assertEqual(batch_processor.memory_peak, 1_440_000)
+            if engine == "pool":
+                self.assertEqual(active[1], 1)
+    
+    def test_invalid_memory_budget(self):
+        """Test a non-positive memory budget is rejected"""
+        with self.assertRaises(ValueError):
+            BatchProcessor(memory_budget=0)
+    
+    def test_second_run_skips_generated_outputs(self):
+        """Test outputs written by a run are not picked up as sources by the next"""
+        batch_processor = BatchProcessor(max_workers=2, backup=False)
+        first = batch_processor.process_folder(self.test_folder, sizes=[100])
+        second = batch_processor.process_folder(self.test_folder, sizes=[100])
+        
+        self.assertEqual(len(first), 5)
+        self.assertEqual(
+            sorted(r["original_path"] for r in second),
+            sorted(r["original_path"] for r in first)
+        )
+    
+    def test_processing_starts_before_walk_finishes(self):
+        """Test files are streamed into the pool as the walk finds them"""
+        batch_processor = BatchProcessor(max_workers=1, backup=False)
+        first_done = threading.Event()
+        seen_before_rest = []
+        files = batch_processor._find_image_files(self.test_folder, True)
+        
+        def slow_walk(folder_path, recursive):
+            yield files[0]
+            seen_before_rest.append(first_done.wait(timeout=10))
+            yield from files[1:]
+        
+        original = batch_processor.processor.process_image
+        
+        def tracked(*args, **kwargs):
+            try:
+                return original(*args, **kwargs)
+            finally:
+                first_done.set()
+        
+        with patch.object(batch_processor, "_iter_image_files", side_effect=slow_walk), \
+                patch.object(batch_processor.processor, "process_image", side_effect=tracked):
+            results = batch_processor.process_folder(self.test_folder, sizes=[100], dry_run=True)
+        
+        self.assertEqual(seen_before_rest, [True])
+        self.assertEqual(len(results), 5)
+    
+    def test_process_paths(self):
+        """Test an explicit path list is processed without walking the folder"""
+        batch_processor = BatchProcessor(max_workers=2, backup=False)
+        wanted = self.test_folder / "test_image_1.jpg"
+        first = batch_processor.process_paths([wanted], sizes=[100])
+        output = Path(first[0]["outputs"][0]["path"])
+        notes = self.test_folder / "notes.txt"
+        notes.write_text("not an image")
+        missing = self.test_folder / "missing.jpg"
+        
+        with patch.object(batch_processor, "_iter_image_files") as walk:
+            results = batch_processor.process_paths(
+                iter([str(wanted), output, notes, missing]), sizes=[100], dry_run=True
+            )
+        
+        walk.assert_not_called()
+        self.assertEqual(sorted(r["original_path"] for r in results), [str(missing), str(wanted)])
+        errors = [r for r in results if "error" in r]
+        self.assertEqual([r["original_path"] for r in errors], [str(missing)])
+    
+    def test_invalid_executor(self):
+        """Test unknown executors are rejected"""
+        with self.assertRaises(ValueError):
+            BatchProcessor(executor="fibers")
+    
     def test_process_empty_folder(self):
         """Test processing empty folder"""
         empty_folder = Path(self.temp_dir) / "empty"
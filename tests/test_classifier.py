@@ -0,0 +1,156 @@
+"""
+Unit tests for the content classifier
+"""
+
+import unittest
+import io
+from PIL import Image, ImageDraw
+import numpy as np
+
+from image_optimizer.classifier import (
+    FEATURE_NAMES,
+    get_sample,
+    extract_features,
+    classify_image,
+    classify_images
+)
+
+
+def make_photo(rng, width=800, height=600):
+    """Gradient with sensor-like noise"""
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([x * 255 / width, y * 255 / height, (x + y) * 127 / (width + height)], axis=2)
+    pixels += rng.normal(0, 12, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB')
+
+
+def make_smooth_photo(rng, width=800, height=600):
+    """Low-noise sky-like gradient"""
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.stack([100 + x * 50 / width, 150 + y * 60 / height, 200 + 0 * x], axis=2)
+    pixels += rng.normal(0, 2, (height, width, 3))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB')
+
+
+def make_screenshot(rng, width=1200, height=800):
+    """Title bar over lines of dark text on a white background"""
+    img = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, width, 40), fill=(50, 50, 60))
+    for row in range(60, height, 18):
+        x = 20
+        while x < width - 100:
+            word = int(rng.integers(10, 60))
+            draw.text((x, row), "def main():"[:max(1, word // 7)], fill=(0, 0, 0))
+            x += word + 8
+    return img
+
+
+def make_graphic(rng, width=800, height=600):
+    """A few solid shapes on a flat background"""
+    img = Image.new('RGB', (width, height), (240, 240, 255))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((100, 100, 400, 400), fill=(255, 0, 0))
+    draw.rectangle((450, 150, 700, 500), fill=(0, 128, 0))
+    draw.line((0, 0, width, height), fill=(0, 0, 0), width=5)
+    return img
+
+
+def make_transparent_logo(rng, width=400, height=400):
+    """Solid shape on a transparent background"""
+    img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    ImageDraw.Draw(img).ellipse((50, 50, 350, 350), fill=(0, 90, 200, 255))
+    return img
+
+
+def as_jpeg(img, quality=85):
+    """Round-trip an image through the JPEG encoder"""
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+class TestClassifier(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        """Build the labelled synthetic corpus"""
+        rng = np.random.default_rng(0)
+        cls.corpus = [
+            ("photo", make_photo(rng)),
+            ("photo", as_jpeg(make_photo(rng))),
+            ("photo", make_smooth_photo(rng)),
+            ("photo", as_jpeg(make_smooth_photo(rng))),
+            ("screenshot", make_screenshot(rng)),
+            ("screenshot", as_jpeg(make_screenshot(rng))),
+            ("graphic", make_graphic(rng)),
+            ("graphic", as_jpeg(make_graphic(rng))),
+            ("graphic", make_transparent_logo(rng)),
+            ("graphic", make_graphic(rng).convert('P', palette=Image.Palette.ADAPTIVE))
+        ]
+    
+    def test_classify_corpus(self):
+        """Test every labelled image is classified correctly"""
+        for index, (label, img) in enumerate(self.corpus):
+            self.assertEqual(classify_image(img), label, f"corpus image {index}")
+    
+    def test_classify_images_batch(self):
+        """Test the batch API matches single-image classification"""
+        images = [img for label, img in self.corpus]
+        self.assertEqual(classify_images(images), [label for label, img in self.corpus])
+        self.assertEqual(classify_images([]), [])
+    
+    def test_jpeg_screenshot_is_not_photo(self):
+        """Test JPEG screenshots are no longer treated as photos"""
+        img = as_jpeg(make_screenshot(np.random.default_rng(1)), quality=75)
+        self.assertEqual(classify_image(img), "screenshot")
+    
+    def test_transparent_photo_ignoring_alpha(self):
+        """Test transparent photos are classified by their visible pixels"""
+        rng = np.random.default_rng(2)
+        cutout = make_photo(rng).convert('RGBA')
+        # Clear everything outside a centred ellipse, like a product cut-out
+        mask = Image.new('L', cutout.size, 0)
+        ImageDraw.Draw(mask).ellipse((200, 100, 600, 500), fill=255)
+        cutout.putalpha(mask)
+        
+        self.assertEqual(classify_image(cutout), "graphic")
+        self.assertEqual(classify_image(cutout, ignore_alpha=True), "photo")
+        logo = make_transparent_logo(rng)
+        self.assertEqual(classify_images([cutout, logo], ignore_alpha=True), ["photo", "graphic"])
+    
+    def test_get_sample(self):
+        """Test samples are bounded and never upscaled"""
+        sample = get_sample(Image.new('RGB', (4000, 1000)), size=256)
+        self.assertEqual(sample.shape, (256, 256, 4))
+        
+        sample = get_sample(Image.new('L', (100, 50)), size=256)
+        self.assertEqual(sample.shape, (50, 50, 4))
+    
+    def test_extract_features(self):
+        """Test feature values on simple inputs"""
+        samples = np.zeros((2, 16, 16, 4), dtype=np.uint8)
+        samples[..., 3] = 255
+        samples[1, :, 8:, :3] = 255
+        samples[1, 0, 0, 3] = 0
+        
+        features = extract_features(samples)
+        self.assertEqual(features.shape, (2, len(FEATURE_NAMES)))
+        
+        unique_colors, edge_density, flat_ratio, alpha_ratio = features[0]
+        self.assertAlmostEqual(unique_colors, 1 / 256)
+        self.assertEqual(edge_density, 0)
+        self.assertEqual(flat_ratio, 1)
+        self.assertEqual(alpha_ratio, 0)
+        
+        # The fully transparent pixel is left out of the colour features
+        unique_colors, edge_density, flat_ratio, alpha_ratio = features[1]
+        self.assertAlmostEqual(unique_colors, 2 / 255)
+        self.assertGreater(edge_density, 0)
+        self.assertLess(flat_ratio, 1)
+        self.assertAlmostEqual(alpha_ratio, 1 / 256)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,8 @@ from click.testing import CliRunner
 from PIL import Image
 import numpy as np
 
-from image_optimizer.cli import main
+from image_optimizer.cli import main, parse_max_bytes, parse_formats, parse_memory_budget
+from image_optimizer.codecs import CODECS
 from image_optimizer_minimal import main as minimal_main
 
 
@@ -93,6 +94,104 @@ class TestCLI(unittest.TestCase):
         self.assertNotEqual(result.exit_code, 0)
         self.assertIn('Error:', result.output)
 
+    
+    def test_parse_max_bytes(self):
+        """Test --max-bytes parsing"""
+        self.assertIsNone(parse_max_bytes(None))
+        self.assertEqual(parse_max_bytes("50000"), 50000)
+        self.assertEqual(parse_max_bytes("400:30000, 800:80000"), {400: 30000, 800: 80000})
+        
+        with self.assertRaises(ValueError):
+            parse_max_bytes("400:big")
+    
+    def test_parse_memory_budget(self):
+        """Test --memory-budget parsing"""
+        self.assertIsNone(parse_memory_budget(None))
+        self.assertEqual(parse_memory_budget("1500000"), 1500000)
+        self.assertEqual(parse_memory_budget("512M"), 512 * 1024 ** 2)
+        self.assertEqual(parse_memory_budget("1.5gb"), int(1.5 * 1024 ** 3))
+        
+        with self.assertRaises(ValueError):
+            parse_memory_budget("lots")
+        with self.assertRaises(ValueError):
+            parse_memory_budget("0")
+    
+    def test_cli_optimize_target_ssim(self):
+        """Test optimize command with an SSIM target"""
+        image_path = self.test_folder / "test.jpg"
+        result = self.runner.invoke(main, [
+            'optimize', str(image_path),
+            '--no-backup', '--sizes', '200', '--target-ssim', '0.5'
+        ])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('trials', result.output)
+
+    
+    def test_parse_formats(self):
+        """Test --formats parsing"""
+        self.assertIsNone(parse_formats(None))
+        self.assertEqual(parse_formats("jpeg,webp"), ["jpeg", "webp"])
+        self.assertEqual(parse_formats(".jpg, png"), ["jpeg", "png"])
+        
+        with self.assertRaises(ValueError):
+            parse_formats("bmp2000")
+    
+    def test_cli_unavailable_format_skipped(self):
+        """Test unavailable codecs are skipped with a warning"""
+        image_path = self.test_folder / "test.jpg"
+        jxl = CODECS["jxl"]
+        available = jxl.available
+        jxl.available = False
+        try:
+            result = self.runner.invoke(main, [
+                'optimize', str(image_path),
+                '--no-backup', '--sizes', '200', '--formats', 'jpeg,jxl'
+            ])
+        finally:
+            jxl.available = available
+        
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Warning: skipping jxl', result.output)
+        self.assertIn('JPEG', result.output)
+        self.assertNotIn('WEBP', result.output)
+
+    
+    def test_cli_recompress(self):
+        """Test recompress reports bytes saved per file"""
+        image_path = self.test_folder / "flat.png"
+        Image.new("RGB", (300, 300), "white").save(image_path, "PNG", compress_level=0)
+        
+        result = self.runner.invoke(main, [
+            'recompress', str(self.test_folder), '--no-backup'
+        ])
+        
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn(f"{image_path}: ", result.output)
+        self.assertIn("saved", result.output)
+        self.assertIn("Total saved:", result.output)
+    
+    def test_cli_batch_from_file(self):
+        """Test batch reads NUL-separated paths from stdin"""
+        second = self.test_folder / "second.jpg"
+        Image.new("RGB", (300, 200), "blue").save(second, "JPEG")
+        paths = f"{self.test_folder / 'test.jpg'}\0{second}\0"
+        
+        result = self.runner.invoke(main, [
+            'batch', '--from-file', '-', '-0', '--no-backup', '--sizes', '100'
+        ], input=paths.encode())
+        
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Files processed: 2", result.output)
+        self.assertTrue((self.test_folder / "second_100px" / "second.jpg").exists())
+    
+    def test_cli_batch_needs_one_source(self):
+        """Test batch rejects both or neither of a folder and --from-file"""
+        neither = self.runner.invoke(main, ['batch'])
+        both = self.runner.invoke(main, ['batch', str(self.test_folder), '--from-file', '-'], input=b"")
+        
+        self.assertNotEqual(neither.exit_code, 0)
+        self.assertNotEqual(both.exit_code, 0)
+        self.assertIn("Error:", both.output)
 
 class TestMinimalCLI(unittest.TestCase):
     
@@ -0,0 +1,85 @@
+"""
+Unit tests for the codec registry
+"""
+
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+from PIL import Image, features
+import numpy as np
+
+from image_optimizer.codecs import (
+    CODECS,
+    Codec,
+    register_codec,
+    get_codec,
+    available_codecs
+)
+from image_optimizer.processor import ImageProcessor
+
+
+class TestCodecs(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_builtin_codecs(self):
+        """Test built-in codecs declare their capabilities"""
+        self.assertEqual(get_codec("jpeg").extension, "jpg")
+        self.assertFalse(get_codec("jpeg").supports_alpha)
+        self.assertTrue(get_codec("png").supports_palette)
+        self.assertFalse(get_codec("png").lossy)
+        self.assertTrue(get_codec("webp").supports_animation)
+        self.assertIsNotNone(get_codec("webp").lossless_kwargs)
+    
+    def test_get_codec_lookup(self):
+        """Test lookup by name, extension and alias"""
+        self.assertIs(get_codec("JPEG"), CODECS["jpeg"])
+        self.assertIs(get_codec(".jpg"), CODECS["jpeg"])
+        self.assertIs(get_codec("jpegxl"), CODECS["jxl"])
+        
+        with self.assertRaises(ValueError):
+            get_codec("doc")
+    
+    def test_availability_detection(self):
+        """Test availability follows the Pillow build"""
+        self.assertIn("jpeg", available_codecs())
+        self.assertEqual(CODECS["avif"].available, features.check("avif"))
+    
+    def test_register_codec(self):
+        """Test a registered codec can be looked up and replaced"""
+        original = CODECS["png"]
+        try:
+            custom = register_codec(Codec("png", "PNG", "png", lossy=False, save_kwargs={"compress_level": 1}))
+            self.assertIs(get_codec("png"), custom)
+        finally:
+            register_codec(original)
+    
+    @unittest.skipUnless(features.check("avif"), "Pillow built without AVIF")
+    def test_process_image_avif(self):
+        """Test AVIF output when allowed and available"""
+        image_path = Path(self.temp_dir) / "photo.jpg"
+        pixels = np.random.default_rng(0).integers(0, 256, (300, 400, 3), dtype=np.uint8)
+        Image.fromarray(pixels, 'RGB').save(image_path, 'JPEG')
+        
+        processor = ImageProcessor(backup=False, encoder_profile="fast", prune=False)
+        result = processor.process_image(
+            image_path, sizes=[200], output_formats=["jpeg", "webp", "avif"]
+        )
+        
+        self.assertEqual([o["format"] for o in result["outputs"]], ["jpeg", "webp", "avif"])
+        avif_path = Path(result["outputs"][2]["path"])
+        self.assertEqual(avif_path.suffix, ".avif")
+        with Image.open(avif_path) as img:
+            self.assertEqual(img.format, "AVIF")
+            self.assertEqual(img.size, (200, 150))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -187,6 +187,39 @@ class TestEXIFOrientation(unittest.TestCase):
             # Just verify the dry-run completed successfully
             self.assertTrue(result['outputs'])
     
+    def test_orientation_transform_pixels(self):
+        """Test outputs match Pillow's reference EXIF transpose for every orientation"""
+        from PIL import ImageOps
+        
+        for orientation in range(1, 9):
+            # Quadrants of different colours make every transform distinguishable
+            img = Image.new('RGB', (200, 100), color='red')
+            img.paste((0, 255, 0), (100, 0, 200, 50))
+            img.paste((0, 0, 255), (0, 50, 100, 100))
+            exif = Image.Exif()
+            exif[0x0112] = orientation
+            test_file = self.temp_dir / f"quadrants_{orientation}.png"
+            img.save(test_file, format='PNG', exif=exif)
+            
+            result = self.processor.process_image(test_file, sizes=[50], generate_webp=False)
+            self.assertEqual(result['orientation'], orientation)
+            if orientation == 1:
+                self.assertIsNone(result['transform'])
+            else:
+                self.assertIsNotNone(result['transform'])
+            
+            with Image.open(test_file) as source:
+                expected = ImageOps.exif_transpose(source)
+                expected = expected.resize(result['outputs'][0]['size'])
+            with Image.open(result['outputs'][0]['path']) as output:
+                # Compare the colour at each quadrant centre (JPEG is lossy)
+                w, h = output.size
+                for point in [(w // 4, h // 4), (3 * w // 4, h // 4), (w // 4, 3 * h // 4)]:
+                    got = output.convert('RGB').getpixel(point)
+                    want = expected.convert('RGB').getpixel(point)
+                    for a, b in zip(got, want):
+                        self.assertLess(abs(a - b), 40, f"orientation {orientation} at {point}")
+    
     def test_real_world_scenario(self):
         """Test with a more realistic scenario"""
         # Create a portrait image that was saved as landscape
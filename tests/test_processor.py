@@ -3,13 +3,24 @@ Unit tests for image processor
 """
 
 import unittest
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import json
+import pickle
 import tempfile
 import shutil
+import subprocess
 from pathlib import Path
-from PIL import Image
+from PIL import Image, ImageCms
 import numpy as np
+from unittest.mock import patch
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
 
-from image_optimizer.processor import ImageProcessor
+from image_optimizer.processor import ImageProcessor, _encode_from_shared_memory
 
 
 class TestImageProcessor(unittest.TestCase):
@@ -70,6 +81,8 @@ class TestImageProcessor(unittest.TestCase):
     
     def test_process_image_with_webp(self):
         """Test image processing with WebP generation"""
+        # Random noise compresses worse as WebP, so keep every output
+        self.processor.prune = False
         result = self.processor.process_image(
             self.test_image_path,
             sizes=[400],
@@ -163,6 +176,768 @@ class TestImageProcessor(unittest.TestCase):
         # Check that backup was not created
         self.assertFalse(result["backup_created"])
 
+    
+    def test_cascade_resize_mode(self):
+        """Test cascade mode produces the same outputs as direct mode"""
+        processor = ImageProcessor(backup=False, resize_mode="cascade", prune=False)
+        
+        result = processor.process_image(
+            self.test_image_path,
+            sizes=[200, 400, 800],
+            generate_webp=True,
+            dry_run=False
+        )
+        
+        # 3 sizes x 2 formats, the 800px output is capped at the source width
+        self.assertEqual(len(result["outputs"]), 6)
+        for output in result["outputs"]:
+            with Image.open(output["path"]) as img:
+                self.assertEqual(img.size, output["size"])
+    
+    def test_cascade_frames_reuse_previous(self):
+        """Test cascade frames are resized from the previous frame"""
+        processor = ImageProcessor(backup=False, resize_mode="cascade", prune=False)
+        source = Image.new("RGB", (600, 800), color="red")
+        
+        frames = {
+            width: frame for width, frame, resampling in processor._resize_frames(
+                source, {200: (200, 266), 400: (400, 533), 800: (600, 800)}
+            )
+        }
+        
+        self.assertEqual(frames[800].size, (600, 800))
+        self.assertIsNot(frames[800], source)
+        self.assertEqual(frames[400].size, (400, 533))
+        self.assertEqual(frames[200].size, (200, 266))
+    
+    def test_frames_shared_between_formats(self):
+        """Test each size is resized once for all output formats"""
+        processor = ImageProcessor(backup=False, prune=False)
+        original_resize = Image.Image.resize
+        calls = []
+        
+        def counting_resize(img, size, *args, **kwargs):
+            calls.append(tuple(size))
+            return original_resize(img, size, *args, **kwargs)
+        
+        with patch.object(Image.Image, "resize", counting_resize):
+            result = processor.process_image(
+                self.test_image_path,
+                sizes=[200, 400],
+                generate_webp=True
+            )
+        
+        # Content detection samples the source too, only count output frames
+        self.assertEqual(calls.count((200, 266)) + calls.count((400, 533)), 2)
+        
+        # Outputs are still reported grouped by format in size order
+        self.assertEqual(
+            [(o["format"], o["size"][0]) for o in result["outputs"]],
+            [("jpeg", 200), ("jpeg", 400), ("webp", 200), ("webp", 400)]
+        )
+    
+    def test_draft_decoding(self):
+        """Test large JPEGs are decoded at a reduced scale"""
+        image_path = Path(self.temp_dir) / "large.jpg"
+        Image.new("RGB", (2400, 1600), color="green").save(image_path, "JPEG")
+        
+        processor = ImageProcessor(backup=False)
+        result = processor.process_image(image_path, sizes=[400], generate_webp=False)
+        
+        # 1/2 scale keeps at least twice the output resolution
+        self.assertEqual(result["decoded_size"], (1200, 800))
+        with Image.open(result["outputs"][0]["path"]) as img:
+            self.assertEqual(img.size, (400, 266))
+        
+        processor = ImageProcessor(backup=False, draft=False)
+        result = processor.process_image(image_path, sizes=[400], generate_webp=False)
+        self.assertEqual(result["decoded_size"], (2400, 1600))
+    
+    def test_resampling_presets(self):
+        """Test resampling presets report the path each output took"""
+        image_path = Path(self.temp_dir) / "wide.png"
+        Image.new("RGB", (2400, 1200), color="blue").save(image_path, "PNG")
+        
+        processor = ImageProcessor(backup=False, resampling="balanced")
+        result = processor.process_image(image_path, sizes=[200, 800], generate_webp=False)
+        
+        paths = {o["size"][0]: o["resampling"] for o in result["outputs"]}
+        self.assertEqual(paths[200], "reduce 6x6 + lanczos")
+        self.assertEqual(paths[800], "lanczos")
+        for output in result["outputs"]:
+            with Image.open(output["path"]) as img:
+                self.assertEqual(img.size, output["size"])
+        
+        processor = ImageProcessor(backup=False, resampling="exact")
+        result = processor.process_image(image_path, sizes=[200], generate_webp=False)
+        self.assertEqual(result["outputs"][0]["resampling"], "lanczos")
+        
+        with self.assertRaises(ValueError):
+            ImageProcessor(resampling="bogus")
+    
+    def test_encoder_profiles(self):
+        """Test encoder profiles change the JPEG encoder settings"""
+        from PIL import JpegImagePlugin
+        
+        for profile, progressive in [("fast", False), ("max", True)]:
+            processor = ImageProcessor(backup=False, encoder_profile=profile)
+            result = processor.process_image(
+                self.test_image_path, sizes=[400], generate_webp=False
+            )
+            with Image.open(result["outputs"][0]["path"]) as img:
+                self.assertEqual(bool(img.info.get("progressive")), progressive)
+        
+        # Screenshots keep full chroma resolution outside the fast profile
+        processor = ImageProcessor(backup=False, encoder_profile="balanced")
+        output_path = Path(self.temp_dir) / "screenshot.jpg"
+        processor._save_image(
+            Image.new("RGB", (64, 64), "white"), output_path, "jpeg", 90, "screenshot"
+        )
+        with Image.open(output_path) as img:
+            self.assertEqual(JpegImagePlugin.get_sampling(img), 0)
+        
+        with self.assertRaises(ValueError):
+            ImageProcessor(encoder_profile="bogus")
+    
+    def test_target_ssim_search(self):
+        """Test quality search for an SSIM floor"""
+        result = self.processor.process_image(
+            self.test_image_path, sizes=[200], generate_webp=True, target_ssim=0.5
+        )
+        
+        for output in result["outputs"]:
+            self.assertTrue(output["target_met"])
+            self.assertGreaterEqual(output["ssim"], 0.5)
+            self.assertLessEqual(output["search_trials"], 7)
+            self.assertEqual(output["file_size"], Path(output["path"]).stat().st_size)
+    
+    def test_max_bytes_search(self):
+        """Test quality search for a per-width byte budget"""
+        result = self.processor.process_image(
+            self.test_image_path, sizes=[200, 400], generate_webp=False,
+            max_bytes={200: 12000, 400: 40000}
+        )
+        
+        budgets = {200: 12000, 400: 40000}
+        for output in result["outputs"]:
+            self.assertTrue(output["target_met"])
+            self.assertLessEqual(output["file_size"], budgets[output["size"][0]])
+        
+        with self.assertRaises(ValueError):
+            self.processor.process_image(
+                self.test_image_path, target_ssim=0.9, max_bytes=1000
+            )
+    
+    def test_alpha_graphic_output_formats(self):
+        """Test transparent graphics produce PNG and lossless WebP"""
+        image_path = Path(self.temp_dir) / "logo.png"
+        img = Image.new("RGBA", (600, 400), (0, 0, 0, 0))
+        img.paste((200, 30, 30, 255), (100, 100, 500, 300))
+        img.save(image_path, "PNG")
+        
+        result = self.processor.process_image(image_path, sizes=[300])
+        
+        self.assertEqual(result["image_kind"], "alpha")
+        self.assertEqual([o["format"] for o in result["outputs"]], ["png", "webp"])
+        self.assertTrue(result["outputs"][1]["lossless"])
+        with Image.open(result["outputs"][0]["path"]) as output:
+            self.assertEqual(output.mode, "RGBA")
+            self.assertEqual(output.getpixel((0, 0))[3], 0)
+    
+    def test_alpha_photo_gets_lossy_webp(self):
+        """Test transparent photos produce PNG and lossy WebP"""
+        image_path = Path(self.temp_dir) / "cutout.png"
+        rng = np.random.default_rng(0)
+        pixels = rng.integers(0, 256, (800, 1200, 4), dtype=np.uint8)
+        pixels[..., 3] = 255
+        pixels[:100, :100, 3] = 0
+        Image.fromarray(pixels, "RGBA").save(image_path, "PNG")
+        
+        result = self.processor.process_image(image_path, sizes=[800])
+        
+        self.assertEqual(result["image_kind"], "alpha")
+        self.assertEqual(result["content_type"], "photo")
+        webp = [o for o in result["outputs"] if o["format"] == "webp"]
+        self.assertEqual(len(webp), 1)
+        self.assertFalse(webp[0].get("lossless", False))
+        with Image.open(webp[0]["path"]) as output:
+            self.assertEqual(output.mode, "RGBA")
+            self.assertEqual(output.getpixel((0, 0))[3], 0)
+    
+    def test_palette_output_stays_palette(self):
+        """Test palette images keep a palette in PNG output"""
+        image_path = Path(self.temp_dir) / "chart.gif"
+        img = Image.new("RGB", (500, 300), "white")
+        img.paste((0, 0, 255), (50, 50, 250, 250))
+        img.convert("P", palette=Image.Palette.ADAPTIVE).save(image_path, "GIF")
+        
+        result = self.processor.process_image(image_path, sizes=[250])
+        
+        self.assertEqual(result["image_kind"], "palette")
+        self.assertEqual([o["format"] for o in result["outputs"]], ["png", "webp"])
+        with Image.open(result["outputs"][0]["path"]) as output:
+            self.assertEqual(output.mode, "P")
+            self.assertEqual(output.size, (250, 150))
+    
+    def test_folder_output_override(self):
+        """Test a folder settings file restricts output formats"""
+        image_path = Path(self.temp_dir) / "overlay.png"
+        Image.new("RGBA", (200, 200), (0, 128, 0, 128)).save(image_path, "PNG")
+        settings_path = Path(self.temp_dir) / ".image_optimizer.json"
+        settings_path.write_text('{"output": [".jpg"]}')
+        
+        from image_optimizer.utils import _load_folder_output_formats
+        _load_folder_output_formats.cache_clear()
+        try:
+            result = self.processor.process_image(image_path, sizes=[100])
+        finally:
+            _load_folder_output_formats.cache_clear()
+        
+        # Only JPEG is allowed, so the transparent image is flattened
+        self.assertEqual([o["format"] for o in result["outputs"]], ["jpeg"])
+        with Image.open(result["outputs"][0]["path"]) as output:
+            self.assertEqual(output.mode, "RGB")
+        
+        # An explicit list overrides the folder settings
+        result = self.processor.process_image(
+            image_path, sizes=[100], output_formats=[".png"]
+        )
+        self.assertEqual([o["format"] for o in result["outputs"]], ["png"])
+    
+    def test_animated_gif_to_animated_webp(self):
+        """Test animated GIFs keep their frames and merge duplicates"""
+        image_path = Path(self.temp_dir) / "spinner.gif"
+        colours = ["red", "red", "green", "blue", "blue", "blue"]
+        frames = []
+        for index, colour in enumerate(colours):
+            frame = Image.new("RGB", (300, 200), colour)
+            frame.paste((255, 255, 255), (10, 10, 60, 60))
+            # A slight shade change the GIF encoder keeps but dedupe ignores
+            frame.putpixel((index, 0), tuple(abs(c - 2) for c in frame.getpixel((index, 0))))
+            frames.append(frame)
+        frames[0].save(
+            image_path, "GIF", save_all=True, append_images=frames[1:],
+            duration=[50, 60, 70, 80, 90, 100], loop=0
+        )
+        
+        result = self.processor.process_image(image_path, sizes=[150, 100])
+        
+        self.assertEqual(result["animation"], {
+            "source_frames": 6, "output_frames": 3, "merged_frames": 3
+        })
+        webp = [o for o in result["outputs"] if o["format"] == "webp"]
+        self.assertEqual([o["size"] for o in webp], [(150, 100), (100, 66)])
+        for output in webp:
+            self.assertEqual(output["frames"], 3)
+            self.assertEqual(output["bytes_saved"], result["original_size"] - output["file_size"])
+            with Image.open(output["path"]) as animation:
+                self.assertEqual(animation.n_frames, 3)
+                self.assertEqual(animation.size, output["size"])
+                durations = []
+                for index in range(animation.n_frames):
+                    animation.seek(index)
+                    animation.load()
+                    durations.append(animation.info["duration"])
+                self.assertEqual(durations, [110, 70, 270])
+    
+    def test_animated_gif_small_motion_kept(self):
+        """Test a small region moving across a large frame is not merged away"""
+        image_path = Path(self.temp_dir) / "sprite.gif"
+        frames = []
+        for index in range(10):
+            frame = Image.new("RGB", (600, 400), "white")
+            frame.paste((200, 30, 30), (50 * index, 190, 50 * index + 20, 210))
+            frames.append(frame)
+        frames[0].save(image_path, "GIF", save_all=True, append_images=frames[1:], duration=80, loop=0)
+        
+        result = self.processor.process_image(image_path, sizes=[300], output_formats=["webp"])
+        
+        self.assertEqual(result["animation"], {
+            "source_frames": 10, "output_frames": 10, "merged_frames": 0
+        })
+        with Image.open(result["outputs"][0]["path"]) as animation:
+            self.assertEqual(animation.n_frames, 10)
+    
+    def test_animated_gif_loop_count_kept(self):
+        """Test a GIF without a loop extension still plays once as WebP"""
+        for loop, expected in [(None, 1), (0, 0)]:
+            image_path = Path(self.temp_dir) / "once.gif"
+            frames = [Image.new("RGB", (120, 80), colour) for colour in ["red", "blue"]]
+            extra = {} if loop is None else {"loop": loop}
+            frames[0].save(image_path, "GIF", save_all=True, append_images=frames[1:], duration=100, **extra)
+            with Image.open(image_path) as source:
+                self.assertEqual("loop" in source.info, loop is not None)
+            
+            result = self.processor.process_image(image_path, sizes=[100], output_formats=["webp"])
+            
+            with Image.open(result["outputs"][0]["path"]) as animation:
+                self.assertEqual(animation.info["loop"], expected)
+    
+    def test_animated_gif_without_animated_format(self):
+        """Test animated GIFs fall back to a still image for still-only formats"""
+        image_path = Path(self.temp_dir) / "blink.gif"
+        frames = [Image.new("RGB", (200, 100), c) for c in ("red", "black")]
+        frames[0].save(image_path, "GIF", save_all=True, append_images=frames[1:])
+        
+        result = self.processor.process_image(image_path, sizes=[100], output_formats=["png"])
+        
+        self.assertNotIn("animation", result)
+        self.assertEqual([o["format"] for o in result["outputs"]], ["png"])
+    
+    def test_recompress_png_in_place(self):
+        """Test PNGs are re-deflated losslessly and backed up"""
+        from PIL import PngImagePlugin
+        image_path = Path(self.temp_dir) / "diagram.png"
+        img = Image.new("RGB", (400, 300), "white")
+        img.paste((200, 30, 30), (40, 40, 200, 160))
+        info = PngImagePlugin.PngInfo()
+        info.add_text("Software", "editor " * 50)
+        img.save(image_path, "PNG", compress_level=0, pnginfo=info)
+        original_size = image_path.stat().st_size
+        
+        result = self.processor.recompress_image(image_path)
+        
+        self.assertTrue(result["replaced"])
+        self.assertTrue(result["backup_created"])
+        self.assertEqual(result["recompressed_size"], image_path.stat().st_size)
+        self.assertEqual(result["bytes_saved"], original_size - result["recompressed_size"])
+        with Image.open(image_path) as output:
+            self.assertEqual(output.tobytes(), img.tobytes())
+            self.assertNotIn("Software", output.info)
+        
+        # Already optimal files are left alone
+        second = self.processor.recompress_image(image_path)
+        self.assertFalse(second["replaced"])
+        self.assertEqual(second["bytes_saved"], 0)
+    
+    def test_recompress_dry_run(self):
+        """Test dry run reports savings without touching the file"""
+        image_path = Path(self.temp_dir) / "flat.png"
+        Image.new("L", (300, 300), 128).save(image_path, "PNG", compress_level=0)
+        before = image_path.read_bytes()
+        
+        result = self.processor.recompress_image(image_path, dry_run=True)
+        
+        self.assertGreater(result["bytes_saved"], 0)
+        self.assertFalse(result["replaced"])
+        self.assertEqual(image_path.read_bytes(), before)
+    
+    def test_recompress_jpeg_without_jpegtran(self):
+        """Test JPEGs are skipped when jpegtran is not installed"""
+        with patch("image_optimizer.processor.shutil.which", return_value=None):
+            result = self.processor.recompress_image(self.test_image_path)
+        
+        self.assertIn("not found", result["skipped"])
+        self.assertFalse(result["replaced"])
+    
+    def test_recompress_png_keeps_orientation_and_colour(self):
+        """Test PNG recompression keeps EXIF orientation, gAMA and sRGB"""
+        from PIL import PngImagePlugin
+        image_path = Path(self.temp_dir) / "rotated.png"
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        info = PngImagePlugin.PngInfo()
+        info.add(b"gAMA", (45455).to_bytes(4, "big"))
+        info.add(b"sRGB", b"\x00")
+        Image.new("RGB", (300, 200), "white").save(
+            image_path, "PNG", compress_level=0, exif=exif, pnginfo=info
+        )
+        
+        result = self.processor.recompress_image(image_path)
+        
+        self.assertTrue(result["replaced"])
+        with Image.open(image_path) as output:
+            output.load()
+            self.assertEqual(output.getexif().get(0x0112), 6)
+            self.assertEqual(output.info["gamma"], 0.45455)
+            self.assertEqual(output.info["srgb"], 0)
+    
+    def test_recompress_jpeg_runs_jpegtran(self):
+        """Test the jpegtran command keeps EXIF only when it holds the orientation"""
+        rotated = Path(self.temp_dir) / "rotated.jpg"
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new("RGB", (300, 200), "white").save(rotated, "JPEG", exif=exif)
+        
+        def fake_run(command, **kwargs):
+            return subprocess.CompletedProcess(command, 0, stdout=b"optimized", stderr=b"")
+        
+        with patch("image_optimizer.processor.shutil.which", return_value="/usr/bin/jpegtran"), \
+                patch("image_optimizer.processor.subprocess.run", side_effect=fake_run) as run:
+            plain = self.processor.recompress_image(self.test_image_path, dry_run=True)
+            result = self.processor.recompress_image(rotated)
+        
+        self.assertEqual(run.call_args_list[0].args[0][:4], ["jpegtran", "-copy", "none", "-optimize"])
+        self.assertEqual(run.call_args_list[1].args[0][:3], ["jpegtran", "-copy", "all"])
+        self.assertEqual(plain["recompressed_size"], len(b"optimized"))
+        self.assertTrue(result["replaced"])
+        self.assertEqual(rotated.read_bytes(), b"optimized")
+    
+    def test_recompress_jpeg_without_copy_icc(self):
+        """Test jpegtran builds without -copy icc are retried with -copy all"""
+        image_path = Path(self.temp_dir) / "profiled.jpg"
+        icc = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+        Image.new("RGB", (300, 200), "white").save(image_path, "JPEG", icc_profile=icc)
+        
+        def fake_run(command, **kwargs):
+            if command[2] == "icc":
+                raise subprocess.CalledProcessError(1, command, stderr=b"unknown option")
+            return subprocess.CompletedProcess(command, 0, stdout=b"optimized", stderr=b"")
+        
+        with patch("image_optimizer.processor.shutil.which", return_value="/usr/bin/jpegtran"), \
+                patch("image_optimizer.processor.subprocess.run", side_effect=fake_run) as run:
+            result = self.processor.recompress_image(image_path, dry_run=True)
+        
+        self.assertEqual([call.args[0][2] for call in run.call_args_list], ["icc", "all"])
+        self.assertEqual(result["recompressed_size"], len(b"optimized"))
+    
+    @unittest.skipUnless(shutil.which("jpegtran"), "jpegtran not installed")
+    def test_recompress_jpeg_lossless(self):
+        """Test jpegtran output decodes to the same pixels and keeps the orientation"""
+        image_path = Path(self.temp_dir) / "rotated.jpg"
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        with Image.open(self.test_image_path) as img:
+            img.save(image_path, "JPEG", quality=90, exif=exif, optimize=False)
+            expected = Image.open(image_path).tobytes()
+        
+        result = self.processor.recompress_image(image_path)
+        
+        self.assertNotIn("skipped", result)
+        with Image.open(image_path) as output:
+            self.assertEqual(output.tobytes(), expected)
+            self.assertEqual(output.getexif().get(0x0112), 6)
+    
+    def test_prune_larger_alternative(self):
+        """Test a WebP that does not beat the JPEG is dropped"""
+        processor = ImageProcessor(backup=False)
+        with patch.object(processor, "prune_ratio", 0.5):
+            result = processor.process_image(self.test_image_path, sizes=[300], quality=60)
+        
+        jpeg = result["outputs"][0]
+        self.assertEqual([o["format"] for o in result["outputs"]], ["jpeg"])
+        self.assertEqual(len(result["pruned"]), 1)
+        pruned = result["pruned"][0]
+        self.assertEqual(pruned["format"], "webp")
+        self.assertEqual(pruned["fallback"], jpeg["path"])
+        self.assertFalse(Path(pruned["path"]).exists())
+        self.assertEqual(processor.get_stats()["files_created"], 1)
+        self.assertEqual(processor.get_stats()["optimized_size"], jpeg["file_size"])
+    
+    def test_prune_output_larger_than_original(self):
+        """Test a resized JPEG larger than a small original falls back to it"""
+        image_path = Path(self.temp_dir) / "small.jpg"
+        pixels = np.random.default_rng(0).integers(0, 256, (200, 300, 3), dtype=np.uint8)
+        Image.fromarray(pixels, "RGB").save(image_path, "JPEG", quality=30)
+        processor = ImageProcessor(backup=False)
+        
+        result = processor.process_image(
+            image_path, sizes=[290], quality=100, output_formats=["jpeg"]
+        )
+        
+        self.assertEqual(result["outputs"], [])
+        self.assertEqual(result["pruned"][0]["fallback"], str(image_path))
+    
+    def test_invalid_prune_ratio(self):
+        """Test prune ratios outside (0, 1] are rejected"""
+        with self.assertRaises(ValueError):
+            ImageProcessor(prune_ratio=1.5)
+    
+    def create_small_image(self):
+        """Create a 300px wide screenshot-like image"""
+        image_path = Path(self.temp_dir) / "small.png"
+        img = Image.new("RGB", (300, 200), "white")
+        img.paste((30, 30, 200), (20, 20, 150, 120))
+        img.save(image_path, "PNG")
+        return image_path
+    
+    def test_duplicate_dimensions_hardlinked(self):
+        """Test widths beyond the source are encoded once and hardlinked"""
+        image_path = self.create_small_image()
+        processor = ImageProcessor(backup=False, prune=False)
+        
+        with patch.object(processor, "_save_image", wraps=processor._save_image) as save:
+            result = processor.process_image(image_path, sizes=[200, 400, 800])
+        
+        # 200px plus a single 300px encode, per format
+        self.assertEqual(save.call_count, 4)
+        self.assertEqual(len(result["outputs"]), 6)
+        jpeg = [o for o in result["outputs"] if o["format"] == "jpeg"]
+        self.assertNotIn("alias_of", jpeg[1])
+        self.assertEqual(jpeg[2]["alias_of"], jpeg[1]["path"])
+        self.assertTrue(Path(jpeg[1]["path"]).samefile(jpeg[2]["path"]))
+        
+        # Linked outputs add no new bytes to the stats
+        stats = processor.get_stats()
+        self.assertEqual(stats["files_created"], 4)
+    
+    def test_duplicate_dimensions_symlinked(self):
+        """Test the symlink layout points at the encoded file"""
+        image_path = self.create_small_image()
+        processor = ImageProcessor(backup=False, prune=False, layout="symlink")
+        
+        result = processor.process_image(image_path, sizes=[400, 800], output_formats=["png"])
+        
+        alias = Path(result["outputs"][1]["path"])
+        self.assertTrue(alias.is_symlink())
+        self.assertFalse(Path(os.readlink(alias)).is_absolute())
+        self.assertTrue(alias.samefile(result["outputs"][0]["path"]))
+    
+    def test_rerun_replaces_linked_outputs(self):
+        """Test a re-run with a larger source does not write through old links"""
+        for layout in ["hardlink", "symlink"]:
+            image_path = self.create_small_image()
+            processor = ImageProcessor(backup=False, prune=False, layout=layout)
+            processor.process_image(image_path, sizes=[200, 400, 800])
+            
+            # The 400px and 800px outputs now link to the 300px encode
+            Image.new("RGB", (1200, 800), "white").save(image_path, "PNG")
+            result = processor.process_image(image_path, sizes=[200, 400, 800])
+            
+            for output in result["outputs"]:
+                path = Path(output["path"])
+                self.assertFalse(path.is_symlink(), (layout, path))
+                with Image.open(path) as img:
+                    self.assertEqual(img.size, output["size"], (layout, path))
+            for folder in Path(self.temp_dir).glob("small_*px"):
+                shutil.rmtree(folder)
+    
+    def test_duplicate_dimensions_manifest(self):
+        """Test the manifest layout lists aliases without writing files"""
+        image_path = self.create_small_image()
+        processor = ImageProcessor(backup=False, prune=False, layout="manifest")
+        
+        result = processor.process_image(image_path, sizes=[400, 800], output_formats=["png"])
+        
+        self.assertFalse((Path(self.temp_dir) / "small_800px").exists())
+        manifest = json.loads(Path(result["manifest"]).read_text())
+        self.assertEqual(manifest, {
+            "400": {"png": "small_400px/small.png"},
+            "800": {"png": "small_400px/small.png"}
+        })
+    
+    def test_shared_memory_encode_matches_serial(self):
+        """Test the shared-memory pipeline writes the same files as the serial path"""
+        image = Image.open(self.test_image_path)
+        exif = image.getexif()
+        exif[0x0112] = 6
+        serial_path = Path(self.temp_dir) / "serial.jpg"
+        shared_path = Path(self.temp_dir) / "shared.jpg"
+        image.save(serial_path, exif=exif)
+        image.save(shared_path, exif=exif)
+        image.close()
+        
+        sizes = [200, 400, 800, 1200]
+        serial = ImageProcessor(backup=False, prune=False).process_image(serial_path, sizes=sizes)
+        # Copy the source in uneven bands of seven rows
+        with patch("image_optimizer.processor.shared_memory.SharedMemory",
+                   wraps=shared_memory.SharedMemory) as memory, \
+                patch("image_optimizer.processor.SHARED_COPY_BAND_BYTES", image.width * 3 * 7):
+            shared = ImageProcessor(
+                backup=False, prune=False, shared_min_pixels=1, shared_workers=2
+            ).process_image(shared_path, sizes=sizes)
+        
+        memory.assert_called_once()
+        self.assertEqual(len(shared["outputs"]), len(serial["outputs"]))
+        for expected, actual in zip(serial["outputs"], shared["outputs"]):
+            self.assertEqual(actual["size"], expected["size"])
+            self.assertEqual(Path(actual["path"]).read_bytes(), Path(expected["path"]).read_bytes())
+        self.assertIn("alias_of", shared["outputs"][-1])
+    
+    def test_shared_memory_encode_cancelled(self):
+        """Test a cancelled shared-memory encode stops and releases its block"""
+        from image_optimizer.processor import ProcessingCancelled
+        processor = ImageProcessor(backup=False, prune=False, shared_min_pixels=1, shared_workers=2)
+        cancel_event = threading.Event()
+        cancel_event.set()
+        
+        blocks = []
+        SharedMemory = shared_memory.SharedMemory
+        
+        def create(*args, **kwargs):
+            block = SharedMemory(*args, **kwargs)
+            blocks.append(block.name)
+            return block
+        
+        with patch("image_optimizer.processor.shared_memory.SharedMemory", side_effect=create):
+            with self.assertRaises(ProcessingCancelled):
+                processor.process_image(self.test_image_path, sizes=[200, 400], cancel_event=cancel_event)
+        
+        self.assertEqual(len(blocks), 1)
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=blocks[0])
+        self.assertIsNone(processor._shared_pool)
+        self.assertFalse((Path(self.temp_dir) / "test_image_200px").exists())
+    
+    def test_shared_memory_pool_reused_without_fork(self):
+        """Test one processor keeps a single non-fork pool for shared-memory encodes"""
+        processor = ImageProcessor(backup=False, prune=False, shared_min_pixels=1, shared_workers=2)
+        with patch("image_optimizer.processor.ProcessPoolExecutor", wraps=ProcessPoolExecutor) as pool:
+            for name in ["first.jpg", "second.jpg"]:
+                image_path = Path(self.temp_dir) / name
+                shutil.copy(self.test_image_path, image_path)
+                result = processor.process_image(image_path, sizes=[200, 400])
+                self.assertEqual(len(result["outputs"]), 4)
+        
+        pool.assert_called_once()
+        self.assertNotEqual(pool.call_args.kwargs["mp_context"].get_start_method(), "fork")
+    
+    def test_shared_memory_worker_skips_tile_pool(self):
+        """Test shared-memory workers resize without starting their own tile pool"""
+        processor = ImageProcessor(backup=False, prune=False, tile_min_pixels=1, tile_workers=4)
+        worker = pickle.loads(pickle.dumps(processor))
+        with Image.open(self.test_image_path) as img:
+            pixels = np.asarray(img.convert("RGB"))
+        memory = shared_memory.SharedMemory(create=True, size=pixels.nbytes)
+        try:
+            np.ndarray(pixels.shape, dtype=np.uint8, buffer=memory.buf)[...] = pixels
+            encoded = _encode_from_shared_memory(
+                worker, memory.name, pixels.shape, "RGB", None, self.test_image_path,
+                200, (200, 150), ["jpeg"], {}
+            )
+        finally:
+            memory.close()
+            memory.unlink()
+        
+        self.assertEqual(encoded["jpeg"]["size"], (200, 150))
+        self.assertEqual(worker.tile_workers, 1)
+        self.assertIsNone(worker._tile_pool)
+        self.assertEqual(processor.tile_workers, 4)
+    
+    def test_process_image_async(self):
+        """Test the async entry point matches process_image"""
+        processor = ImageProcessor(backup=False, prune=False)
+        
+        result = asyncio.run(processor.process_image_async(self.test_image_path, sizes=[200]))
+        
+        self.assertEqual(result["original_path"], str(self.test_image_path))
+        self.assertEqual([o["size"] for o in result["outputs"]], [(200, 266), (200, 266)])
+        self.assertTrue(all(Path(o["path"]).exists() for o in result["outputs"]))
+    
+    def test_process_image_async_process_executor_stats(self):
+        """Test stats from a process pool worker reach the calling processor"""
+        processor = ImageProcessor(backup=False, prune=False)
+        processor.process_image(self.test_image_path, sizes=[100])
+        
+        async def run():
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                return await processor.process_image_async(self.test_image_path, executor=executor, sizes=[200])
+        
+        result = asyncio.run(run())
+        
+        self.assertEqual([o["size"] for o in result["outputs"]], [(200, 266), (200, 266)])
+        stats = processor.get_stats()
+        self.assertEqual(stats["processed"], 2)
+        self.assertEqual(stats["files_created"], 4)
+    
+    def test_process_image_async_cancel(self):
+        """Test cancelling stops encodes that have not started yet"""
+        processor = ImageProcessor(backup=False, prune=False, encode_workers=2)
+        started = threading.Event()
+        finished = threading.Event()
+        original_encode = processor._encode_frame
+        
+        def slow_encode(*args, **kwargs):
+            # Cancel once both formats of the first size are encoding
+            if encode.call_count == 2:
+                started.set()
+            time.sleep(0.2)
+            return original_encode(*args, **kwargs)
+        
+        async def cancel_midway():
+            task = asyncio.ensure_future(
+                processor.process_image_async(self.test_image_path, sizes=[100, 200, 300])
+            )
+            await asyncio.get_running_loop().run_in_executor(None, started.wait)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        
+        with patch.object(processor, "_encode_frame", side_effect=slow_encode) as encode:
+            with patch.object(processor, "_finish_image", side_effect=lambda *a: finished.set()):
+                asyncio.run(cancel_midway())
+        
+        # Only the two formats of the first size were already encoding
+        self.assertEqual(encode.call_count, 2)
+        self.assertFalse(finished.is_set())
+    
+    def test_outputs_encoded_in_parallel(self):
+        """Test one image's outputs are encoded concurrently up to encode_workers"""
+        lock = threading.Lock()
+        active = [0, 0]
+        
+        def run(workers, image_path, **kwargs):
+            processor = ImageProcessor(
+                backup=False, prune=False, encoder_profile="fast", encode_workers=workers
+            )
+            original = processor._save_image
+            active[:] = [0, 0]
+            
+            def tracked(*args, **kwargs):
+                with lock:
+                    active[0] += 1
+                    active[1] = max(active[1], active[0])
+                try:
+                    time.sleep(0.05)
+                    return original(*args, **kwargs)
+                finally:
+                    with lock:
+                        active[0] -= 1
+            
+            with patch.object(processor, "_save_image", side_effect=tracked):
+                result = processor.process_image(image_path, **kwargs)
+            # Later runs overwrite the same paths, so read the files now
+            encoded = [
+                (o["format"], o["size"], o["quality"], hashlib.sha256(Path(o["path"]).read_bytes()).hexdigest())
+                for o in result["outputs"]
+            ]
+            return encoded, active[1]
+        
+        serial, serial_peak = run(1, self.test_image_path, sizes=[100, 200, 300], target_ssim=0.9)
+        parallel, parallel_peak = run(3, self.test_image_path, sizes=[100, 200, 300], target_ssim=0.9)
+        
+        self.assertEqual(serial_peak, 1)
+        self.assertGreater(parallel_peak, 1)
+        self.assertLessEqual(parallel_peak, 3)
+        # Concurrent saves of one frame must not share encoder settings
+        self.assertEqual(parallel, serial)
+        
+        # Widths capped at the source size share one resized frame but
+        # encode separately when their byte budgets differ
+        image_path = Path(self.temp_dir) / "capped.jpg"
+        rng = np.random.default_rng(0)
+        Image.fromarray(rng.integers(0, 256, (300, 450, 3), dtype=np.uint8)).save(image_path, quality=95)
+        kwargs = {"sizes": [500, 800], "max_bytes": {500: 20000, 800: 80000}}
+        serial, _ = run(1, image_path, **kwargs)
+        parallel, _ = run(8, image_path, **kwargs)
+        self.assertEqual(parallel, serial)
+    
+    def test_tiled_resize_matches_single_call(self):
+        """Test strip-parallel resizing matches one resize call within rounding"""
+        rng = np.random.default_rng(0)
+        for mode, channels in [("RGB", 3), ("RGBA", 4)]:
+            pixels = rng.integers(0, 256, (450, 600, channels), dtype=np.uint8)
+            source = Image.fromarray(pixels, mode)
+            for resampling in ["exact", "fast"]:
+                tiled = ImageProcessor(
+                    backup=False, resampling=resampling, tile_min_pixels=1, tile_workers=4
+                )
+                single = ImageProcessor(backup=False, resampling=resampling, tile_min_pixels=0)
+                
+                result, path = tiled._resize(source, (190, 142))
+                expected, _ = single._resize(source, (190, 142))
+                
+                self.assertIn("in 4 strips", path)
+                self.assertEqual(result.size, expected.size)
+                diff = np.abs(np.asarray(result, dtype=np.int16) - np.asarray(expected, dtype=np.int16))
+                self.assertLessEqual(diff.max(), 1, (mode, resampling))
+                self.assertLess(diff.mean(), 0.01, (mode, resampling))
+    
+    def test_invalid_resize_mode(self):
+        """Test unsupported resize mode is rejected"""
+        with self.assertRaises(ValueError):
+            ImageProcessor(resize_mode="bogus")
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
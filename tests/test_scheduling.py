@@ -0,0 +1,112 @@
+"""
+Unit tests for batch scheduling policies
+"""
+
+import os
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+from PIL import Image
+import numpy as np
+
+from image_optimizer.scheduling import (
+    SCHEDULING_POLICIES,
+    SchedulingPolicy,
+    register_policy,
+    get_policy,
+    order_files,
+    estimate_savings
+)
+from image_optimizer.batch import BatchProcessor
+
+
+class TestScheduling(unittest.TestCase):
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.folder = Path(self.temp_dir)
+        rng = np.random.default_rng(0)
+        
+        # a: small noisy JPEG (large file for its pixels), oldest
+        # b: large flat PNG (most pixels, tiny file), newest
+        # c: medium noisy JPEG
+        self.small = self.folder / "a.jpg"
+        Image.fromarray(rng.integers(0, 256, (300, 400, 3), dtype=np.uint8)).save(self.small, quality=95)
+        self.large = self.folder / "b.png"
+        Image.new("RGB", (2000, 1500), "white").save(self.large)
+        self.medium = self.folder / "c.jpg"
+        Image.fromarray(rng.integers(0, 256, (600, 800, 3), dtype=np.uint8)).save(self.medium, quality=95)
+        
+        for age, path in enumerate([self.large, self.medium, self.small]):
+            os.utime(path, (1_700_000_000 - age * 100, 1_700_000_000 - age * 100))
+        self.files = [self.small, self.large, self.medium]
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_builtin_policies(self):
+        """Test each built-in policy's order"""
+        self.assertEqual(order_files(self.files[::-1], "path"), [self.small, self.large, self.medium])
+        self.assertEqual(order_files(self.files, "largest"), [self.large, self.medium, self.small])
+        self.assertEqual(order_files(self.files, "savings"), [self.medium, self.small, self.large])
+        self.assertEqual(order_files(self.files, "newest"), [self.large, self.medium, self.small])
+    
+    def test_path_policy_does_not_probe(self):
+        """Test the default order reads no headers"""
+        with patch("image_optimizer.scheduling.probe_image") as probe:
+            order_files(self.files, "path")
+        probe.assert_not_called()
+    
+    def test_unreadable_files_sort_last_by_cost(self):
+        """Test files whose header cannot be read are still scheduled"""
+        broken = self.folder / "broken.jpg"
+        broken.write_bytes(b"not an image")
+        
+        ordered = order_files(self.files + [broken], "largest")
+        
+        self.assertEqual(ordered[-1], broken)
+    
+    def test_estimate_savings(self):
+        """Test the savings estimate uses the largest output width"""
+        probe = {"width": 4000, "height": 3000, "file_size": 5_000_000}
+        # 1200x900 output at 2 bits per pixel is 270,000 bytes
+        self.assertEqual(estimate_savings(probe, [400, 1200]), 4_730_000)
+        self.assertEqual(estimate_savings({"width": 0, "height": 0, "file_size": 10}, [400]), 0)
+    
+    def test_register_policy(self):
+        """Test a registered policy can be looked up and used"""
+        register_policy(SchedulingPolicy("smallest-file", lambda path, probe, sizes: probe["file_size"]))
+        try:
+            self.assertIs(get_policy("smallest-file"), SCHEDULING_POLICIES["smallest-file"])
+            self.assertEqual(order_files(self.files, "smallest-file")[0], self.large)
+        finally:
+            del SCHEDULING_POLICIES["smallest-file"]
+        
+        with self.assertRaises(ValueError):
+            get_policy("random")
+    
+    def test_batch_processes_in_schedule_order(self):
+        """Test process_folder starts files in the scheduled order"""
+        batch_processor = BatchProcessor(max_workers=1, backup=False, schedule="largest")
+        started = []
+        original = batch_processor.processor.process_image
+        
+        def tracked(image_path, **kwargs):
+            started.append(Path(image_path))
+            return original(image_path, **kwargs)
+        
+        with patch.object(batch_processor.processor, "process_image", side_effect=tracked):
+            batch_processor.process_folder(self.folder, sizes=[100], dry_run=True)
+        
+        self.assertEqual(started, [self.large, self.medium, self.small])
+        
+        with self.assertRaises(ValueError):
+            BatchProcessor(schedule="random")
+
+
+if __name__ == '__main__':
+    unittest.main()
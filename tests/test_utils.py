@@ -5,9 +5,11 @@ Unit tests for utility functions
 import unittest
 import tempfile
 import os
+import io
 from pathlib import Path
 from PIL import Image
 import numpy as np
+from unittest.mock import patch
 
 from image_optimizer.utils import (
     is_image_file,
@@ -15,7 +17,13 @@ from image_optimizer.utils import (
     calculate_output_sizes,
     get_quality_settings,
     format_file_size,
-    calculate_size_reduction
+    calculate_size_reduction,
+    calculate_ssim,
+    clear_content_type_cache,
+    get_image_kind,
+    select_output_formats,
+    iter_image_files,
+    iter_path_list
 )
 
 
@@ -69,6 +77,39 @@ class TestUtils(unittest.TestCase):
         self.assertFalse(is_image_file("test.pdf"))
         self.assertFalse(is_image_file("test"))
     
+    def test_iter_image_files_prunes_outputs_and_backups(self):
+        """Test the folder walk skips generated outputs, backups and ignored paths"""
+        root = Path(self.temp_dir) / "site"
+        for relative in ["a.jpg", "a_400px/a.jpg", "a_400px/a.webp", "notes.txt",
+                         "post/b.png", "post/b_800px/b.png", "post/drafts/c.jpg",
+                         "orphan_400px/d.jpg", ".image_optimizer_backup/site/a.jpg"]:
+            path = root / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"")
+        
+        found = [p.relative_to(root).as_posix() for p in iter_image_files(root)]
+        self.assertEqual(found, ["a.jpg", "orphan_400px/d.jpg", "post/b.png", "post/drafts/c.jpg"])
+        
+        found = [p.relative_to(root).as_posix() for p in iter_image_files(root, ignore=["drafts", "orphan_*/*.jpg"])]
+        self.assertEqual(found, ["a.jpg", "post/b.png"])
+        
+        found = [p.relative_to(root).as_posix() for p in iter_image_files(root, recursive=False)]
+        self.assertEqual(found, ["a.jpg"])
+    
+    def test_iter_path_list(self):
+        """Test path lists split on newlines or NULs, across read chunks"""
+        lines = io.BytesIO(b"static/a.jpg\r\n\nstatic/with space.png\nstatic/last.gif")
+        self.assertEqual(
+            list(iter_path_list(lines, chunk_size=5)),
+            [Path("static/a.jpg"), Path("static/with space.png"), Path("static/last.gif")]
+        )
+        
+        nul = io.BytesIO(b"static/new\nline.jpg\0static/b.png\0")
+        self.assertEqual(
+            list(iter_path_list(nul, null_separated=True, chunk_size=4)),
+            [Path("static/new\nline.jpg"), Path("static/b.png")]
+        )
+    
     def test_detect_content_type(self):
         """Test content type detection"""
         # Test photo detection (JPEG)
@@ -84,6 +125,85 @@ class TestUtils(unittest.TestCase):
         result = detect_content_type(graphic_path)
         self.assertIn(result, ["screenshot", "graphic"])
     
+    def test_detect_content_type_open_image(self):
+        """Test detection reuses an already open image"""
+        graphic_path = Path(self.temp_dir) / "test_graphic.png"
+        
+        with Image.open(graphic_path) as img:
+            with patch("image_optimizer.utils.Image.open") as mock_open:
+                result = detect_content_type(graphic_path, img=img)
+                mock_open.assert_not_called()
+        
+        self.assertIn(result, ["screenshot", "graphic"])
+    
+    def test_detect_content_type_cache(self):
+        """Test detection results are cached by file identity"""
+        clear_content_type_cache()
+        photo_path = Path(self.temp_dir) / "test_photo.jpg"
+        
+        with patch("image_optimizer.utils._detect_image_content_type",
+                   return_value="photo") as mock_detect:
+            detect_content_type(photo_path)
+            detect_content_type(photo_path)
+            self.assertEqual(mock_detect.call_count, 1)
+            
+            # Changing the file invalidates the cached result
+            Image.new("RGB", (50, 50)).save(photo_path, "JPEG")
+            os.utime(photo_path, ns=(0, 0))
+            detect_content_type(photo_path)
+            self.assertEqual(mock_detect.call_count, 2)
+    
+    def test_detect_content_type_cache_bounded(self):
+        """Test the cache keeps only the most recently used files"""
+        clear_content_type_cache()
+        paths = []
+        for index in range(3):
+            path = Path(self.temp_dir) / f"cached_{index}.png"
+            Image.new("RGB", (20, 20)).save(path)
+            paths.append(path)
+        
+        with patch("image_optimizer.utils.CONTENT_TYPE_CACHE_SIZE", 2), \
+                patch("image_optimizer.utils._detect_image_content_type",
+                      return_value="graphic") as mock_detect:
+            detect_content_type(paths[0])
+            detect_content_type(paths[1])
+            # Using the first file again makes the second the oldest
+            detect_content_type(paths[0])
+            detect_content_type(paths[2])
+            self.assertEqual(mock_detect.call_count, 3)
+            
+            detect_content_type(paths[0])
+            self.assertEqual(mock_detect.call_count, 3)
+            detect_content_type(paths[1])
+            self.assertEqual(mock_detect.call_count, 4)
+        
+        from image_optimizer.utils import _content_type_cache
+        self.assertEqual(len(_content_type_cache), 2)
+        clear_content_type_cache()
+    
+    def test_get_image_kind(self):
+        """Test image kind detection from the mode and alpha usage"""
+        self.assertEqual(get_image_kind(Image.new('RGB', (10, 10))), "opaque")
+        self.assertEqual(get_image_kind(Image.new('P', (10, 10))), "palette")
+        self.assertEqual(get_image_kind(Image.new('RGBA', (10, 10), (0, 0, 0, 0))), "alpha")
+        self.assertEqual(get_image_kind(Image.new('LA', (10, 10), (0, 100))), "alpha")
+        
+        # An alpha band that is fully opaque does not count
+        self.assertEqual(get_image_kind(Image.new('RGBA', (10, 10), (0, 0, 0, 255))), "opaque")
+    
+    def test_select_output_formats(self):
+        """Test output format selection"""
+        self.assertEqual(select_output_formats("opaque"), ["jpeg", "webp"])
+        self.assertEqual(select_output_formats("alpha"), ["png", "webp"])
+        self.assertEqual(select_output_formats("palette"), ["png", "webp"])
+        
+        # Restricted output extensions
+        self.assertEqual(select_output_formats("alpha", [".png"]), ["png"])
+        self.assertEqual(select_output_formats("opaque", [".webp"]), ["webp"])
+        
+        # Falls back to whatever is allowed
+        self.assertEqual(select_output_formats("alpha", [".jpeg"]), ["jpeg"])
+    
     def test_calculate_output_sizes(self):
         """Test output size calculation"""
         # Test with larger image
@@ -162,6 +282,31 @@ class TestUtils(unittest.TestCase):
         reduction = calculate_size_reduction(0, 500)
         self.assertEqual(reduction, 0)
 
+    
+    def test_calculate_ssim(self):
+        """Test structural similarity calculation"""
+        rng = np.random.default_rng(0)
+        pixels = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+        reference = Image.fromarray(pixels, 'RGB')
+        
+        # Identical images are perfectly similar
+        self.assertAlmostEqual(calculate_ssim(reference, reference.copy()), 1.0)
+        
+        # More noise means less similarity
+        noisy = np.clip(pixels + rng.normal(0, 10, pixels.shape), 0, 255).astype(np.uint8)
+        noisier = np.clip(pixels + rng.normal(0, 40, pixels.shape), 0, 255).astype(np.uint8)
+        score = calculate_ssim(reference, Image.fromarray(noisy, 'RGB'))
+        worse = calculate_ssim(reference, Image.fromarray(noisier, 'RGB'))
+        self.assertLess(score, 1.0)
+        self.assertLess(worse, score)
+        
+        # Images smaller than a block still work
+        tiny = Image.new('L', (5, 3), 128)
+        self.assertAlmostEqual(calculate_ssim(tiny, tiny), 1.0)
+        
+        with self.assertRaises(ValueError):
+            calculate_ssim(reference, Image.new('RGB', (32, 32)))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file